@@ -0,0 +1,141 @@
+import asyncio
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from game import Game
+from plan_validator import validate_plan
+
+BASE_URL = "http://localhost:5000"
+COMMANDS = ["up", "down", "left", "right", "pass", "bomb"]
+
+class AgentRuntime:
+    """
+    asyncio agent loop that overlaps planning with plan execution.
+
+    As soon as a plan is known, the runtime simulates it locally, cutting it
+    at the first illegal or fatal step (see plan_validator), to predict where
+    it will leave the game and asks the planner for the next plan from that
+    predicted state, while the current plan runs on the server through
+    POST /plan. If the server's board after the plan differs from the
+    prediction, the speculative plan is dropped and planning restarts from
+    the real state.
+
+    All HTTP goes through one pooled requests.Session.
+    """
+
+    def __init__(self, planner, base_url=BASE_URL, max_moves=None, pool_size=4, plan_cache=None):
+        """
+        :param planner: Callable or coroutine function taking (game_state, game_info, last_move)
+                        and returning a list of commands; blocking callables run in a thread
+        :param max_moves: Stop after this many executed moves, None to run forever
+        :param plan_cache: The planner's PlanCache, if any; a plan that leads back to the cache
+                           key it was made for is discarded so it is not served again
+        """
+        self.planner = planner
+        self.base_url = base_url
+        self.max_moves = max_moves
+        self.plan_cache = plan_cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.moves = 0
+        self.plans_requested = 0
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        self.plans_cut = 0
+        self.plans_discarded = 0
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _plan(self, game_state, game_info, last_move):
+        self.plans_requested += 1
+        if asyncio.iscoroutinefunction(self.planner):
+            plan = await self.planner(game_state, game_info, last_move)
+        else:
+            plan = await asyncio.to_thread(self.planner, game_state, game_info, last_move)
+        return [command for command in plan if command in COMMANDS]
+
+    def _start_plan(self, game_state, game_info, last_move):
+        """Plan from a state in the background; return the task and the (state, info, last move) it plans for."""
+        return asyncio.create_task(self._plan(game_state, game_info, last_move)), (game_state, game_info, last_move)
+
+    def _discard(self, origin):
+        if self.plan_cache is not None:
+            self.plan_cache.discard(self.plan_cache.key(*origin))
+            self.plans_discarded += 1
+
+    def _discard_if_stuck(self, origin, game_state, game_info, last_move):
+        # The cache would hand the same plan out again from where it leaves the game
+        if self.plan_cache is not None and self.plan_cache.key(*origin) == \
+                self.plan_cache.key(game_state, game_info, last_move):
+            self._discard(origin)
+
+    def predict(self, data, plan):
+        """
+        Simulate `plan` from a state response.
+
+        :return: (the plan cut at its first illegal or fatal step, expected game_state, expected game_info,
+                 whether it was cut)
+        """
+        game = Game.from_state(data["game_state"], data["game_info"], data.get("bombs"))
+        validator = validate_plan(game, plan)
+        if validator.problem is not None:
+            self.plans_cut += 1
+            print(f"Plan cut at step {validator.step} ({validator.problem} {validator.rejected}), "
+                  f"replaced with {validator.repaired}")
+        return (validator.accepted, validator.game.get_game_state(), validator.game.get_game_info(),
+                validator.problem is not None)
+
+    async def run(self):
+        data = await asyncio.to_thread(self._request, "GET", "/state")
+        next_plan, origin = self._start_plan(data["game_state"], data["game_info"], "None")
+        try:
+            while self.max_moves is None or self.moves < self.max_moves:
+                plan = await next_plan
+                if not plan:
+                    next_plan, origin = self._start_plan(data["game_state"], data["game_info"], "None")
+                    continue
+                print(f"New plan: {plan}")
+
+                # Ask for the following plan now, from where this one should leave the game
+                plan, predicted_state, predicted_info, cut = self.predict(data, plan)
+                if cut:
+                    # As in the agents' main loops, a plan that had to be cut is not reused
+                    self._discard(origin)
+                if not plan:
+                    next_plan, origin = self._start_plan(data["game_state"], data["game_info"], "None")
+                    continue
+                planned_from = origin
+                self._discard_if_stuck(planned_from, predicted_state, predicted_info, plan[-1])
+                next_plan, origin = self._start_plan(predicted_state, predicted_info, plan[-1])
+
+                data = await asyncio.to_thread(self._request, "POST", "/plan",
+                                               json={"commands": plan, "stop_on": ["failed_move"]})
+                self.moves += data["executed"]
+                print(f"Executed {data['executed']} moves. {data['game_info']}")
+
+                if data["game_state"] == predicted_state:
+                    self.speculation_hits += 1
+                else:
+                    # The speculative plan started from the wrong board; plan again from the real one
+                    self.speculation_misses += 1
+                    next_plan.cancel()
+                    last_move = data["steps"][-1]["command"]
+                    self._discard_if_stuck(planned_from, data["game_state"], data["game_info"], last_move)
+                    next_plan, origin = self._start_plan(data["game_state"], data["game_info"], last_move)
+        finally:
+            next_plan.cancel()
+            self.session.close()
+        return {
+            "moves": self.moves,
+            "plans_requested": self.plans_requested,
+            "speculation_hits": self.speculation_hits,
+            "speculation_misses": self.speculation_misses,
+            "plans_cut": self.plans_cut,
+            "plans_discarded": self.plans_discarded,
+        }
@@ -1,39 +1,213 @@
-from flask import Flask, jsonify, request
-from game import Game
+import logging
+import os
+
+from flask import Flask, Response, jsonify, request
+from game_registry import GameRegistry
+from metrics import metrics
+from state_codec import CONTENT_TYPE, encode_state
 
 app = Flask(__name__)
-game = Game()
 
-@app.route('/move', methods=['POST'])
-def move():
-    direction = request.json.get('direction')
-    if direction not in ['up', 'down', 'left', 'right', 'pass']:
-        return jsonify({"error": "Invalid direction"}), 400
-    success = game.move_player(direction)
-    return jsonify({
-        "success": success,
-        "game_state": game.get_game_state(),
-        "game_info": game.get_game_info(),
-        "debug_info": f"Player position: ({game.player.x}, {game.player.y})"
-    })
+COMMANDS = ['up', 'down', 'left', 'right', 'pass', 'bomb']
+MAX_PLAN_LENGTH = 100
+# Conditions that can end a /plan early, checked after every step for the player the plan moves
+STOP_CONDITIONS = {
+    'failed_move': lambda game, player, success, score_before: not success,
+    'blast_zone': lambda game, player, success, score_before: bool(game.blast_zone()[player.y, player.x]),
+    'score_loss': lambda game, player, success, score_before: player.score < score_before,
+}
+registry = GameRegistry()
 
-@app.route('/bomb', methods=['POST'])
-def bomb():
-    success = game.place_bomb()
-    return jsonify({
-        "success": success,
-        "game_state": game.get_game_state(),
-        "game_info": game.get_game_info(),
-        "debug_info": f"Player position: ({game.player.x}, {game.player.y})"
-    })
+# The unscoped /move, /bomb and /state routes play this game
+DEFAULT_GAME_ID = "default"
+registry.create(game_id=DEFAULT_GAME_ID, pinned=True)
 
-@app.route('/state', methods=['GET'])
-def state():
-    return jsonify({
+def game_response(game, **fields):
+    fields.update({
+        "move_counter": game.move_counter,
         "game_state": game.get_game_state(),
         "game_info": game.get_game_info(),
+        "bombs": [list(bomb) for bomb in game.board.bombs],  # (x, y, timer) with timer = moves since placement
         "debug_info": f"Player position: ({game.player.x}, {game.player.y})"
     })
+    if len(game.players) > 1:
+        fields["players"] = [{"id": player.id, "x": player.x, "y": player.y, "score": player.score}
+                             for player in game.players]
+    return jsonify(fields)
+
+def unknown_game(game_id):
+    return jsonify({"error": f"Unknown game: {game_id}"}), 404
+
+@app.route('/games', methods=['POST'])
+def create_game():
+    data = request.get_json(silent=True) or {}
+    seed = data.get('seed')
+    try:
+        width, height, players = int(data.get('width', 15)), int(data.get('height', 15)), int(data.get('players', 1))
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "width, height, players and seed must be integers"}), 400
+    try:
+        session = registry.create(width=width, height=height, seed=seed, players=players)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    return jsonify(session.info()), 201
+
+@app.route('/games', methods=['GET'])
+def list_games():
+    return jsonify({"games": registry.list()})
+
+@app.route('/games/<game_id>', methods=['DELETE'])
+def delete_game(game_id):
+    if not registry.delete(game_id):
+        return unknown_game(game_id)
+    return jsonify({"deleted": game_id})
+
+# /move, /bomb and /plan advance the bombs and the move counter once per command, whichever player
+# it is for. In a game with several players, /step plays one round for all of them instead.
+
+@app.route('/move', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/move', methods=['POST'])
+def move(game_id):
+    direction = request.json.get('direction')
+    if direction not in ['up', 'down', 'left', 'right', 'pass']:
+        return jsonify({"error": "Invalid direction"}), 400
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    with session.lock:
+        try:
+            success = session.game.move_player(direction, int(request.json.get('player', 1)))
+        except (TypeError, ValueError) as error:
+            return jsonify({"error": str(error)}), 400
+        return game_response(session.game, success=success)
+
+@app.route('/bomb', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/bomb', methods=['POST'])
+def bomb(game_id):
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    data = request.get_json(silent=True) or {}
+    with session.lock:
+        try:
+            success = session.game.place_bomb(int(data.get('player', 1)))
+        except (TypeError, ValueError) as error:
+            return jsonify({"error": str(error)}), 400
+        return game_response(session.game, success=success)
+
+@app.route('/step', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/step', methods=['POST'])
+def step(game_id):
+    # {"commands": {"<player id>": command}}; players left out do nothing this round
+    commands = (request.get_json(silent=True) or {}).get('commands')
+    if not isinstance(commands, dict) or not commands:
+        return jsonify({"error": "commands must map player ids to commands"}), 400
+    invalid = [command for command in commands.values() if command not in COMMANDS]
+    if invalid:
+        return jsonify({"error": f"Invalid commands: {invalid}"}), 400
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    with session.lock:
+        try:
+            results = session.game.step({int(player_id): command for player_id, command in commands.items()})
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+        return game_response(session.game, results={str(player_id): success for player_id, success in results.items()})
+
+@app.route('/state', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/state', methods=['GET'])
+def state(game_id):
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    since = request.args.get('since', type=int)
+    with session.lock:
+        game = session.game
+        changes = game.get_state_delta(since) if since is not None else None
+        if changes is None:
+            return game_response(game)
+        # The client already has the board at move `since`; send only what changed
+        return jsonify({
+            "move_counter": game.move_counter,
+            "since": since,
+            "changes": changes,
+            "game_info": game.get_game_info(),
+            "bombs": [list(bomb) for bomb in game.board.bombs],
+            "debug_info": f"Player position: ({game.player.x}, {game.player.y})"
+        })
+
+@app.route('/state/binary', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/state/binary', methods=['GET'])
+def binary_state(game_id):
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    with session.lock:
+        return Response(encode_state(session.game), mimetype=CONTENT_TYPE)
+
+@app.route('/plan', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/games/<game_id>/plan', methods=['POST'])
+def plan(game_id):
+    data = request.get_json(silent=True) or {}
+    commands = data.get('commands')
+    stop_on = data.get('stop_on', ['failed_move'])
+    if not isinstance(commands, list) or not 0 < len(commands) <= MAX_PLAN_LENGTH:
+        return jsonify({"error": f"commands must be a list of 1 to {MAX_PLAN_LENGTH} moves"}), 400
+    invalid = [command for command in commands if command not in COMMANDS]
+    if invalid:
+        return jsonify({"error": f"Invalid commands: {invalid}"}), 400
+    if not isinstance(stop_on, list) or not all(isinstance(condition, str) for condition in stop_on):
+        return jsonify({"error": "stop_on must be a list of stop conditions"}), 400
+    unknown = [condition for condition in stop_on if condition not in STOP_CONDITIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown stop conditions: {unknown}"}), 400
+    # Optional [x, y, score] the client expects after each command; the plan stops at the first mismatch
+    expect = data.get('expect')
+    if expect is not None and (not isinstance(expect, list) or len(expect) != len(commands) or not all(
+            isinstance(entry, list) and len(entry) == 3 and
+            all(isinstance(value, int) and not isinstance(value, bool) for value in entry) for entry in expect)):
+        return jsonify({"error": "expect must list one [x, y, score] per command"}), 400
+    player_id = data.get('player', 1)
+    if not isinstance(player_id, int) or isinstance(player_id, bool):
+        return jsonify({"error": "player must be a player id"}), 400
+
+    session = registry.get(game_id)
+    if session is None:
+        return unknown_game(game_id)
+    with session.lock:
+        game = session.game
+        try:
+            player = game.get_player(player_id)
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+        steps = []
+        stopped_by = None
+        for index, command in enumerate(commands):
+            score_before = player.score
+            success = game.apply_command(command, player_id)
+            steps.append({
+                "command": command,
+                "success": success,
+                "move_counter": game.move_counter,
+                "score": player.score,
+                "position": [player.x, player.y]
+            })
+            stopped_by = next((condition for condition in stop_on
+                               if STOP_CONDITIONS[condition](game, player, success, score_before)), None)
+            if not stopped_by and expect is not None and [player.x, player.y, player.score] != list(expect[index]):
+                stopped_by = 'diverged'
+            if stopped_by:
+                break
+        return game_response(game, steps=steps, executed=len(steps), stopped_by=stopped_by)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    # Prometheus text exposition format; empty until metrics are enabled with BOMBERMAN_METRICS=1
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # BOMBERMAN_LOG_LEVEL=DEBUG logs every move
+    logging.basicConfig(level=os.environ.get("BOMBERMAN_LOG_LEVEL", "WARNING"))
+    app.run(debug=True)
@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+import api
+import mock_llm_server
+from plan_cache import PlanCache
+from state_mirror import BoardMirror
+
+API_PORT = 5060
+MOCK_PORT = 5160
+MOVES = 300
+STAGES = ["fetch", "parse", "plan", "post"]
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_agents_baseline.json")
+# A run regresses when moves/sec drops, or a stage's p95 grows, by more than this fraction;
+# run-to-run noise on a shared machine is around 30%
+TOLERANCE = 0.5
+
+# The stage loop below is a simplified copy of the agents' loops: it posts every plan whole and
+# skips PlanValidator, StreamingPlanExecutor and ReplanController, and the claude agent has no
+# board parsing step, so its parse stage is empty. Moves/sec and LLM calls per 100 moves are
+# therefore measured separately by running the agents' own main() loops, see bench_main_loop.
+
+def _claude_agent(agent):
+    thoughts = ["No previous thoughts."]
+
+    def plan(game_state, game_info, last_move):
+        command_data = agent.get_claude_command(game_state, game_info, last_move, thoughts[0])
+        thoughts[0] = command_data.get("thoughts", thoughts[0])
+        return [command for command in command_data["plan"] if command in agent.VALID_COMMANDS]
+    return lambda game_state: None, plan
+
+def _gpt_agent(agent):
+    def plan(game_state, game_info, last_move):
+        _, function_call = agent.openai_command(game_state, game_info, last_move)
+        return json.loads(function_call["arguments"])["moves"]
+    return agent.game_processor.parser.parse, plan
+
+def _openai_moves_agent(agent):
+    def plan(game_state, game_info, last_move):
+        return agent.search_next_n_steps(game_state, game_info, last_move=last_move)
+    return agent.parse_game_state, plan
+
+def _processor_agent(agent):
+    processor = agent.GameStateProcessor()
+    return processor.parser.parse, lambda game_state, game_info, last_move: processor.process_game_state(game_state, game_info)
+
+# Agent name -> (module, adapter returning (parse, plan) callables built from the module's own functions).
+# Modules with a main() loop are also benchmarked through it.
+AGENTS = {
+    "claude": ("claude_api", _claude_agent),
+    "gpt": ("gptapi", _gpt_agent),
+    "openai-moves": ("test_api", _openai_moves_agent),
+    "processor": ("game_state_processor", _processor_agent),
+}
+
+def _serve(app, port):
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _reset_default_game(seed):
+    api.registry.delete(api.DEFAULT_GAME_ID)
+    api.registry.create(game_id=api.DEFAULT_GAME_ID, pinned=True, seed=seed)
+
+def _clear_plan_cache(agent):
+    # Both loops play the same seeded board; without this the second would replay the first one's plans
+    if hasattr(agent, "plan_cache"):
+        agent.plan_cache = PlanCache(agent.plan_cache.prompt_version)
+
+def bench_main_loop(name, moves=MOVES, seed=0):
+    """
+    Run an agent's own main() loop on a seeded board until it has made `moves` moves.
+
+    The agent plays a game of its own through the /games/<id> routes; deleting
+    that game afterwards makes its next /state request fail, which ends main().
+
+    :return: (moves per second, LLM calls per 100 moves)
+    """
+    agent = importlib.import_module(AGENTS[name][0])
+    game_id = f"bench-{name}"
+    api.registry.delete(game_id)
+    game = api.registry.create(game_id=game_id, seed=seed).game
+    agent.BASE_URL = f"http://127.0.0.1:{API_PORT}/games/{game_id}"
+    _clear_plan_cache(agent)
+    llm_requests = mock_llm_server.llm.stats()["requests"]
+
+    start = time.perf_counter()
+    loop = threading.Thread(target=agent.main, daemon=True)
+    loop.start()
+    while game.move_counter < moves and loop.is_alive():
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    move_counter = game.move_counter
+    llm_calls = mock_llm_server.llm.stats()["requests"] - llm_requests
+    api.registry.delete(game_id)
+    loop.join()
+    return round(move_counter / elapsed, 1), round(100 * llm_calls / max(move_counter, 1), 2)
+
+def bench_agent(name, moves=MOVES, seed=0):
+    """
+    Play one agent against the API on a seeded board and time every stage of its loop.
+
+    Each iteration fetches /state, parses the board, asks the agent for a
+    plan and posts it to /plan. This loop leaves out the plan validation,
+    streaming execution and divergence-based replanning of the agents' main()
+    loops, so for agents that have one, moves/sec and LLM calls per 100 moves
+    come from bench_main_loop instead and only the stage timings from here.
+
+    :return: Dict with moves/sec, LLM calls per 100 moves, the loop they were
+             measured on and p50/p95/p99 milliseconds per stage
+    """
+    module_name, adapter = AGENTS[name]
+    agent = importlib.import_module(module_name)
+    agent.BASE_URL = f"http://127.0.0.1:{API_PORT}"
+    parse, plan = adapter(agent)
+    _clear_plan_cache(agent)
+    _reset_default_game(seed)
+    llm_requests = mock_llm_server.llm.stats()["requests"]
+
+    mirror = BoardMirror()
+    timings = {stage: [] for stage in STAGES}
+    last_move = "None"
+    move_counter = 0
+    start = time.perf_counter()
+    while move_counter < moves:
+        tick = time.perf_counter()
+        data = requests.get(f"{agent.BASE_URL}/state", params=mirror.query()).json()
+        timings["fetch"].append(time.perf_counter() - tick)
+
+        tick = time.perf_counter()
+        game_state = mirror.apply(data)
+        parse(game_state)
+        timings["parse"].append(time.perf_counter() - tick)
+
+        tick = time.perf_counter()
+        commands = plan(game_state, data["game_info"], last_move) or ["pass"]
+        timings["plan"].append(time.perf_counter() - tick)
+
+        tick = time.perf_counter()
+        data = requests.post(f"{agent.BASE_URL}/plan", json={"commands": commands, "stop_on": ["failed_move"]}).json()
+        timings["post"].append(time.perf_counter() - tick)
+        mirror.apply(data)
+        last_move = data["steps"][-1]["command"]
+        move_counter += data["executed"]
+    elapsed = time.perf_counter() - start
+
+    llm_calls = mock_llm_server.llm.stats()["requests"] - llm_requests
+    result = {"moves_per_sec": round(move_counter / elapsed, 1),
+              "llm_calls_per_100_moves": round(100 * llm_calls / move_counter, 2), "loop": "stages"}
+    if hasattr(agent, "main"):
+        result["moves_per_sec"], result["llm_calls_per_100_moves"] = bench_main_loop(name, moves, seed)
+        result["loop"] = "main"
+    for stage, samples in timings.items():
+        p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+        result[stage] = {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3)}
+    return result
+
+def compare(name, result, baseline, tolerance=TOLERANCE):
+    """Return descriptions of the metrics in `result` that are worse than `baseline` beyond `tolerance`."""
+    regressions = []
+    if result["moves_per_sec"] < baseline["moves_per_sec"] * (1 - tolerance):
+        regressions.append(f"{name}: moves/sec {result['moves_per_sec']:.1f} < baseline {baseline['moves_per_sec']:.1f}")
+    for stage in STAGES:
+        now, then = result[stage]["p95_ms"], baseline[stage]["p95_ms"]
+        # Millisecond-scale stages are mostly scheduling noise
+        if now > max(then * (1 + tolerance), then + 2.0):
+            regressions.append(f"{name}: {stage} p95 {now:.2f}ms > baseline {then:.2f}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end agent loop benchmark against the local API and mock LLM")
+    parser.add_argument("agents", nargs="*", default=list(AGENTS), help=f"Any of {', '.join(AGENTS)}")
+    parser.add_argument("--moves", type=int, default=MOVES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default="fixed:0", help="Mock LLM latency, see mock_llm_server.LatencyModel")
+    parser.add_argument("--baseline", default=BASELINES)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    # The agents' SDK clients talk to the mock LLM; the keys only have to be non-empty
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    mock_llm_server.llm = mock_llm_server.MockLLM(args.latency, plan_source="processor", seed=args.seed)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servers = [_serve(api.app, API_PORT), _serve(mock_llm_server.app, MOCK_PORT)]
+
+    results = {}
+    try:
+        for name in args.agents:
+            # The agents print every plan and response; keep it off the timing
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = bench_agent(name, args.moves, args.seed)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    print(f"{'agent':>12}  {'loop':>6}  {'moves/s':>8}  {'llm/100':>7}  "
+          + "  ".join(f"{stage + ' p50/p95/p99 ms':>26}" for stage in STAGES))
+    for name, result in results.items():
+        stages = "  ".join(f"{result[stage]['p50_ms']:>8.2f}/{result[stage]['p95_ms']:>8.2f}/{result[stage]['p99_ms']:>8.2f}"
+                           for stage in STAGES)
+        print(f"{name:>12}  {result['loop']:>6}  {result['moves_per_sec']:>8.1f}  "
+              f"{result['llm_calls_per_100_moves']:>7.1f}  {stages}")
+    print("moves/s and llm/100 come from the agent's main() loop where it has one ('main'); the stage timings "
+          "always come from a simplified loop without plan validation, streaming or replanning")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    regressions = [regression for name, result in results.items() if name in baselines
+                   for regression in compare(name, result, baselines[name])]
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions and baselines:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    print("Agent loop benchmark")
+    print("--------------------")
+    raise SystemExit(main())
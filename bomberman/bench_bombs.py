@@ -0,0 +1,47 @@
+import random
+import time
+
+import numpy as np
+
+from game import EMPTY, Game
+
+TICKS = 2000
+
+def bench_update_bombs(live_bombs, ticks=TICKS):
+    """
+    Time Game.update_bombs with a steady population of live bombs.
+
+    One bomb is placed per tick on a random empty cell and the fuse is set to
+    the target population, so roughly `live_bombs` bombs are ticking at once.
+
+    :param live_bombs: Number of bombs kept alive on the board
+    :param ticks: Number of timed ticks
+    :return: Mean seconds per tick
+    """
+    random.seed(0)
+    game = Game(31, 31)
+    game.board.bombs.bomb_timer = live_bombs
+    empty_y, empty_x = np.nonzero(game.board.grid == EMPTY)
+    cells = list(zip(empty_x.tolist(), empty_y.tolist()))
+
+    # Fill the wheel up to its steady state before timing
+    for _ in range(live_bombs + 1):
+        game.board.bombs.add(*random.choice(cells))
+        game.update_bombs()
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        game.board.bombs.add(*random.choice(cells))
+        game.update_bombs()
+    return (time.perf_counter() - start) / ticks
+
+def main():
+    print(f"{'live bombs':>10}  {'us/tick':>8}")
+    for live_bombs in [1, 10, 100, 250, 500, 1000]:
+        per_tick = bench_update_bombs(live_bombs)
+        print(f"{live_bombs:>10}  {per_tick * 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    print("Bomberman bomb scheduler benchmark")
+    print("----------------------------------")
+    main()
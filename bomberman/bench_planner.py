@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+
+from game import STONE, Game
+from game_state_processor import GameStateProcessor
+
+SEEDS = range(20)
+MOVES_PER_GAME = 200
+
+def bench_planner(seeds=SEEDS, moves_per_game=MOVES_PER_GAME, bomb_timers=False):
+    """
+    Let GameStateProcessor play seeded games and measure plan quality and cost.
+
+    :param bomb_timers: Give the planner the live bomb timers instead of only the board
+
+    :return: (moves per stone destroyed, stones destroyed, times hit, mean ms per plan)
+    """
+    processor = GameStateProcessor()
+    stones_destroyed = 0
+    hits = 0
+    plan_times = []
+    for seed in seeds:
+        np.random.seed(seed)
+        game = Game(seed=seed)
+        stones_before = int((game.board.grid == STONE).sum())
+        while game.move_counter < moves_per_game:
+            start = time.perf_counter()
+            bombs = list(game.board.bombs) if bomb_timers else None
+            moves = processor.process_game_state(game.get_game_state(), game.get_game_info(), bombs)
+            plan_times.append(time.perf_counter() - start)
+            for move in moves:
+                score_before = game.player.score
+                stones = int((game.board.grid == STONE).sum())
+                game.apply_command(move)
+                # Each destroyed stone adds 10 and each hit takes 50
+                destroyed = stones - int((game.board.grid == STONE).sum())
+                hits += (10 * destroyed - (game.player.score - score_before)) // 50
+        stones_destroyed += stones_before - int((game.board.grid == STONE).sum())
+    total_moves = len(seeds) * moves_per_game
+    moves_per_stone = total_moves / stones_destroyed if stones_destroyed else float('inf')
+    return moves_per_stone, stones_destroyed, hits, 1000 * sum(plan_times) / len(plan_times)
+
+def main():
+    print(f"games: {len(SEEDS)} x {MOVES_PER_GAME} moves")
+    print(f"{'bomb timers':>12}  {'stones':>6}  {'moves/stone':>11}  {'hits':>4}  {'ms/plan':>7}")
+    for bomb_timers in [False, True]:
+        moves_per_stone, stones, hits, ms_per_plan = bench_planner(bomb_timers=bomb_timers)
+        print(f"{'known' if bomb_timers else 'unknown':>12}  {stones:>6}  {moves_per_stone:>11.2f}  {hits:>4}  {ms_per_plan:>7.3f}")
+
+if __name__ == "__main__":
+    print("GameStateProcessor plan quality benchmark")
+    print("-----------------------------------------")
+    main()
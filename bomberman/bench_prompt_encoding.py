@@ -0,0 +1,43 @@
+import random
+
+from game import Game
+from prompt_encoding import ENCODINGS, encode_board, estimate_tokens
+
+SIZES = [(15, 15), (31, 31)]
+SEEDS = range(10)
+MOVES = 60
+
+def bench_prompt_encoding(width, height, seeds=SEEDS, moves=MOVES):
+    """
+    Encode boards from seeded games played at random and average the prompt size per encoding.
+
+    :return: {encoding: (mean characters, mean estimated tokens)}
+    """
+    totals = {encoding: [0, 0] for encoding in ENCODINGS}
+    boards = 0
+    for seed in seeds:
+        game = Game(width, height, seed=seed)
+        rng = random.Random(seed)
+        for move in range(moves):
+            if move % 10 == 0:
+                game_state = game.get_game_state()
+                for encoding in ENCODINGS:
+                    text = encode_board(game_state, encoding)
+                    totals[encoding][0] += len(text)
+                    totals[encoding][1] += estimate_tokens(text)
+                boards += 1
+            game.apply_command(rng.choice(['up', 'down', 'left', 'right', 'pass', 'bomb']))
+    return {encoding: (chars / boards, tokens / boards) for encoding, (chars, tokens) in totals.items()}
+
+def main():
+    print(f"{'board':>7}  {'encoding':>8}  {'chars':>6}  {'tokens':>6}  {'vs ascii':>8}")
+    for width, height in SIZES:
+        results = bench_prompt_encoding(width, height)
+        ascii_tokens = results["ascii"][1]
+        for encoding, (chars, tokens) in results.items():
+            print(f"{width:>3}x{height:<3}  {encoding:>8}  {chars:>6.0f}  {tokens:>6.0f}  {tokens / ascii_tokens:>7.0%}")
+
+if __name__ == "__main__":
+    print("Board prompt size per encoding")
+    print("------------------------------")
+    main()
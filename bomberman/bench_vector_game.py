@@ -0,0 +1,46 @@
+import random
+import time
+
+import numpy as np
+
+from game import Game
+from vector_game import ACTIONS, VectorGame
+
+STEPS = 2000
+
+def bench_game(steps=STEPS):
+    """Return game steps per second for the Game class driven one move at a time."""
+    random.seed(0)
+    game = Game()
+    actions = [random.choice(ACTIONS) for _ in range(steps)]
+    start = time.perf_counter()
+    for action in actions:
+        if action == 'bomb':
+            game.place_bomb()
+        else:
+            game.move_player(action)
+        game.get_game_state()
+    return steps / (time.perf_counter() - start)
+
+def bench_vector_game(num_games, steps=STEPS):
+    """Return game steps per second, summed over all boards, for VectorGame."""
+    env = VectorGame(num_games, seed=0)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(len(ACTIONS), size=(steps, num_games))
+    start = time.perf_counter()
+    for step_actions in actions:
+        env.step(step_actions)
+    return steps * num_games / (time.perf_counter() - start)
+
+def main():
+    baseline = bench_game()
+    print(f"{'engine':>18}  {'steps/s':>12}  {'speedup':>8}")
+    print(f"{'Game':>18}  {baseline:>12,.0f}  {1.0:>8.1f}")
+    for num_games in [1, 16, 256, 1024]:
+        throughput = bench_vector_game(num_games, steps=max(STEPS // num_games, 50))
+        print(f"{f'VectorGame x{num_games}':>18}  {throughput:>12,.0f}  {throughput / baseline:>8.1f}")
+
+if __name__ == "__main__":
+    print("Bomberman simulator throughput benchmark")
+    print("----------------------------------------")
+    main()
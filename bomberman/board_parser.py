@@ -0,0 +1,56 @@
+import numpy as np
+
+class BoardParser:
+    """
+    Parses board strings into (height, width) character arrays and tracks the player position.
+
+    The previous board is cached. When the next board has the same shape
+    only the cells that differ are written, and the player position is
+    patched from those cells instead of being rescanned.
+    The returned array is reused between calls and must not be modified.
+    """
+
+    def __init__(self):
+        self.game_state = None
+        self.array = None
+        self.player_pos = None  # (row, col)
+
+    def parse(self, game_state):
+        if game_state == self.game_state:
+            return self.array
+
+        # Decode straight from UTF-32 bytes; each row gains one '\n' column that is sliced off
+        width = game_state.find('\n')
+        width = len(game_state) if width < 0 else width
+        cells = np.frombuffer((game_state + '\n').encode('utf-32-le'), dtype='<U1').reshape(-1, width + 1)[:, :width]
+
+        if self.array is not None and cells.shape == self.array.shape:
+            rows, cols = np.nonzero(cells != self.array)
+            self._update(zip(rows.tolist(), cols.tolist()), cells[rows, cols].tolist())
+        else:
+            self.array = cells.copy()
+            self.player_pos = None
+        if self.player_pos is None:
+            self._find_player()
+        self.game_state = game_state
+        return self.array
+
+    def apply_changes(self, changes):
+        """Patch the cached board with (x, y, char) cell changes, as sent by /state?since=<move>."""
+        self._update(((y, x) for x, y, _ in changes), [char for _, _, char in changes])
+        if self.player_pos is None:
+            self._find_player()
+        self.game_state = None  # The cached string no longer matches
+        return self.array
+
+    def _update(self, cells, chars):
+        for cell, char in zip(cells, chars):
+            if self.array[cell] == 'P' and self.player_pos == cell:
+                self.player_pos = None
+            if char == 'P':
+                self.player_pos = cell
+            self.array[cell] = char
+
+    def _find_player(self):
+        rows, cols = np.nonzero(self.array == 'P')
+        self.player_pos = (int(rows[0]), int(cols[0])) if len(rows) else None
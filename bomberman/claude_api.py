@@ -1,35 +1,40 @@
 import anthropic
 import requests
-import json
-import re
+import asyncio
+import sys
+import os
+from agent_runtime import AgentRuntime
+from game import Game
+from plan_cache import PlanCache
+from plan_stream import PlanStreamParser, StreamingPlanExecutor
+from plan_validator import PlanValidator
+from prompt_encoding import encode_board
+from state_mirror import BoardMirror
 
 BASE_URL = "http://localhost:5000"
+VALID_COMMANDS = ["up", "down", "left", "right", "pass", "bomb"]
 
-# Read the API key from the claudekey file
-with open('/home/decoy/MUD-LLM/bomberman/claudeapi', 'r') as key_file:
-    api_key = key_file.read().strip()
+# Read the API key from ANTHROPIC_API_KEY, or else from the claudekey file
+api_key = os.environ.get("ANTHROPIC_API_KEY")
+if not api_key:
+    with open('/home/decoy/MUD-LLM/bomberman/claudeapi', 'r') as key_file:
+        api_key = key_file.read().strip()
 
-# Create an instance of the Anthropic API client
+# Create an instance of the Anthropic API client; ANTHROPIC_BASE_URL can point it at mock_llm_server.py
 client = anthropic.Anthropic(api_key=api_key)
 
+# BOMBERMAN_BOARD_ENCODING picks how the board is written into prompts: ascii, rle, coords or viewport
+BOARD_ENCODING = os.environ.get("BOMBERMAN_BOARD_ENCODING", "ascii")
+# Bump the prompt version whenever the prompts below change
+plan_cache = PlanCache(f"claude-1-{BOARD_ENCODING}", path=os.environ.get("BOMBERMAN_PLAN_CACHE"))
+
 def print_game_state(game_state, game_info, debug_info):
     print("\nCurrent Game State:")
     print(game_state)
     print(game_info)
     print(f"Debug Info: {debug_info}")
 
-def clean_json_string(s):
-    # Remove any control characters
-    s = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', s)
-    # Ensure the string starts with { and ends with }
-    s = s.strip()
-    if not s.startswith('{'):
-        s = '{' + s
-    if not s.endswith('}'):
-        s = s + '}'
-    return s
-
-def get_claude_command(game_state, game_info, last_move, previous_thoughts):
+def ask_claude(game_state, game_info, last_move, previous_thoughts, on_command=None):
     system_prompt = """
 You are an AI agent playing a Bomberman game. Your objective is to destroy breakable stones and avoid explosions.
 The game board is represented by:
@@ -59,7 +64,7 @@ Example response:
 
     user_prompt = f"""
 Current game state:
-{game_state}
+{encode_board(game_state, BOARD_ENCODING)}
 
 Game info:
 {game_info}
@@ -72,38 +77,61 @@ Your previous thoughts:
 Provide your next 10 moves and thoughts on the current game state and strategy.
 """
 
-    response = client.beta.prompt_caching.messages.create(
+    # Stream the answer and hand over each command as soon as its string is closed
+    parser = PlanStreamParser("plan")
+    with client.messages.stream(
         model="claude-3-5-sonnet-20240620",
         max_tokens=1024,
         system=system_prompt,
         messages=[
             {"role": "user", "content": user_prompt}
         ]
-    )
-
-    try:
-        response_content = response.content[0].text
-        cleaned_content = clean_json_string(response_content)
-        command_data = json.loads(cleaned_content)
-        return command_data
-    except (json.JSONDecodeError, IndexError, AttributeError) as e:
-        print(f"Error parsing Claude's response: {e}")
-        print(f"Raw response: {response.content}")
-        print(f"Cleaned response: {cleaned_content}")
+    ) as stream:
+        for text in stream.text_stream:
+            for command in parser.feed(text):
+                if on_command is not None and command in VALID_COMMANDS:
+                    on_command(command)
+
+    if parser.malformed or not parser.complete:
+        print("Error parsing Claude's response: malformed or incomplete JSON object")
+        print(f"Raw response: {parser.text}")
+        return None
+    return parser.result()
+
+def get_claude_command(game_state, game_info, last_move, previous_thoughts, on_command=None):
+    """
+    Get Claude's plan and thoughts for a game state.
+
+    :param on_command: Called with each valid command while the response streams in;
+                       cached plans are returned without calling it
+    """
+    # Identical board, score and last move reuse the earlier plan instead of calling Claude
+    key = plan_cache.key(game_state, game_info, last_move)
+    command_data = plan_cache.get_or_compute(
+        key, lambda: ask_claude(game_state, game_info, last_move, previous_thoughts, on_command))
+    if command_data is None:
         return {"plan": ["pass"], "thoughts": "Error in parsing response"}
+    return command_data
+
+def print_execution(data):
+    for step in data["steps"]:
+        print(f"Executed {step['command']}: {step['success']}")
+    if data["stopped_by"]:
+        print(f"Plan stopped early: {data['stopped_by']}")
+    print(f"Debug Info: {data['debug_info']}")
 
 def main():
     last_move = "None"
     previous_thoughts = "No previous thoughts."
     move_counter = 0
-    plan = []
+    mirror = BoardMirror()
 
     while True:
         # Get the current game state
-        response = requests.get(f"{BASE_URL}/state")
+        response = requests.get(f"{BASE_URL}/state", params=mirror.query())
         if response.status_code == 200:
             data = response.json()
-            game_state = data["game_state"]
+            game_state = mirror.apply(data)
             game_info = data["game_info"]
             debug_info = data["debug_info"]
             print_game_state(game_state, game_info, debug_info)
@@ -111,40 +139,61 @@ def main():
             print(f"Error getting game state: {response.status_code}")
             break
 
-        # Get command from Claude if we don't have a plan or have exhausted the current plan
-        if not plan:
-            command_data = get_claude_command(game_state, game_info, last_move, previous_thoughts)
-            plan = command_data["plan"]
-            previous_thoughts = command_data["thoughts"]
-            print(f"New plan: {plan}")
-            print(f"Thoughts: {previous_thoughts}")
-
-        # Execute the next move in the plan
-        command = plan.pop(0)
-        print(f"Executing command: {command}")
-
-        if command in ["up", "down", "left", "right", "pass"]:
-            response = requests.post(f"{BASE_URL}/move", json={"direction": command})
-            last_move = command
-        elif command == "bomb":
-            response = requests.post(f"{BASE_URL}/bomb")
-            last_move = "bomb"
-        else:
-            print("Invalid command from Claude. Skipping this turn.")
-            continue
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Move result: {data['success']}")
-            print(f"Debug Info: {data['debug_info']}")
-        else:
-            print(f"Error: {response.status_code}")
-
-        move_counter += 1
-        if move_counter % 10 == 0:
-            print(f"Completed 10 moves. Previous thoughts: {previous_thoughts}")
+        # Get a new plan from Claude, executing its commands while the rest streams in.
+        # Each command is first replayed on a local copy of the game and the plan is cut at the first bad one.
+        validator = PlanValidator(Game.from_state(game_state, game_info, mirror.bombs))
+        executor = StreamingPlanExecutor(BASE_URL)
+
+        def submit(command):
+            for checked in validator.check(command):
+                executor.submit(checked)
+        plan_key = plan_cache.key(game_state, game_info, last_move)
+        command_data = get_claude_command(game_state, game_info, last_move, previous_thoughts, submit)
+        previous_thoughts = command_data.get("thoughts", previous_thoughts)
+        print(f"New plan: {command_data['plan']}")
+        print(f"Thoughts: {previous_thoughts}")
+        print(f"Plan cache: {plan_cache.stats()}")
+
+        plan = [command for command in command_data["plan"] if command in VALID_COMMANDS]
+        if len(plan) < len(command_data["plan"]):
+            print("Invalid commands from Claude. Skipping them.")
+        # Cached and fallback plans were not streamed
+        for command in plan[validator.checked:]:
+            submit(command)
+        if validator.problem is not None:
+            print(f"Plan cut at step {validator.step} ({validator.problem} {validator.rejected}), "
+                  f"replaced with {validator.repaired}. Replanning early.")
+            plan_cache.discard(plan_key)
+
+        data = executor.finish()
+        if data is not None:
+            print_execution(data)
+            print(f"First move after {executor.first_move_seconds:.2f}s")
+            game_state = mirror.apply(data)
+            last_move = data["steps"][-1]["command"]
+            # A plan that led back to where it was asked for would be served again forever
+            if plan_cache.key(game_state, data["game_info"], last_move) == plan_key:
+                plan_cache.discard(plan_key)
+            move_counter += data["executed"]
+            print(f"Completed {move_counter} moves. Previous thoughts: {previous_thoughts}")
+
+def async_main():
+    previous_thoughts = ["No previous thoughts."]
+
+    def plan(game_state, game_info, last_move):
+        command_data = get_claude_command(game_state, game_info, last_move, previous_thoughts[0])
+        previous_thoughts[0] = command_data.get("thoughts", previous_thoughts[0])
+        print(f"Thoughts: {previous_thoughts[0]}")
+        return command_data["plan"]
+
+    stats = asyncio.run(AgentRuntime(plan, BASE_URL, plan_cache=plan_cache).run())
+    print(f"Runtime stats: {stats}")
+    print(f"Plan cache: {plan_cache.stats()}")
 
 if __name__ == "__main__":
     print("Bomberman API Test with Claude")
     print("-------------------------------")
-    main()
+    if "--async" in sys.argv:
+        async_main()
+    else:
+        main()
@@ -0,0 +1,46 @@
+import json
+import threading
+
+class FrameBroadcaster:
+    """
+    Serializes the current state once per change and fans it out to spectators.
+
+    Call `publish()` after every change to the watched state. Each spectator
+    iterates `stream()`, which yields a Server-Sent Events frame only when the
+    serialized state differs from the last one it received.
+    """
+
+    def __init__(self, render, keepalive=15):
+        self.render = render  # Returns a JSON-serializable snapshot of the state
+        self.keepalive = keepalive
+        self.frame = None
+        self.version = 0
+        self._condition = threading.Condition()
+        self.publish()
+
+    def publish(self):
+        frame = json.dumps(self.render())
+        with self._condition:
+            if frame == self.frame:
+                return False
+            self.frame = frame
+            self.version += 1
+            self._condition.notify_all()
+        return True
+
+    def wait(self, last_version, timeout=None):
+        """Block until a frame newer than `last_version` exists; return (version, frame)."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > last_version, timeout)
+            return self.version, self.frame
+
+    def stream(self, last_version=0):
+        if last_version > self.version:
+            last_version = 0  # The client saw frames from before a restart
+        while True:
+            version, frame = self.wait(last_version, self.keepalive)
+            if version == last_version:
+                yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+                continue
+            last_version = version
+            yield f"id: {version}\ndata: {frame}\n\n"
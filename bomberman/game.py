@@ -1,42 +1,154 @@
+import copy
+import logging
 import random
+import re
+from collections import defaultdict, deque
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Integer cell codes used by Board.grid
+EMPTY, WALL, STONE, BOMB, PLAYER = 0, 1, 2, 3, 4
+CELL_CHARS = np.array([' ', '#', 'S', 'B', 'P'])
+
+# Blast ray directions as (dx, dy)
+BLAST_DIRECTIONS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)])
+
+# Cells kept clear in each corner so players start with room to move, as (y, x)
+CORNER_CELLS = [(1, 1), (1, 2), (2, 1), (1, -2), (1, -3), (2, -2),
+                (-2, 1), (-2, 2), (-3, 1), (-2, -2), (-2, -3), (-3, -2)]
+
+def wall_grid(height, width, count=None):
+    """
+    Return an empty board with the border and every other interior cell walled.
+
+    :param count: Number of boards to stack along a leading axis, or None for a single (height, width) board
+    """
+    shape = (height, width) if count is None else (count, height, width)
+    grid = np.full(shape, EMPTY, dtype=np.int8)
+    grid[..., :, 0] = grid[..., :, -1] = WALL
+    grid[..., 0, :] = grid[..., -1, :] = WALL
+    grid[..., 2:height - 1:2, 2:width - 1:2] = WALL
+    return grid
+
+def clear_corners(grid):
+    for y, x in CORNER_CELLS:
+        grid[..., y, x] = EMPTY
+
+def blast_rays(grid, xs, ys, blast_range, games=None):
+    """
+    Resolve the blast rays of several bombs in one batched pass.
+
+    All bombs are resolved against the grid as it is before any of them
+    goes off, so bombs firing on the same tick detonate simultaneously.
+
+    :param grid: A (height, width) board, or a stack of boards along a leading axis
+    :param xs: Array of bomb x coordinates
+    :param ys: Array of bomb y coordinates
+    :param blast_range: Number of cells each ray travels
+    :param games: With a stack of boards, the board each bomb sits on
+    :return: (ray_x, ray_y, cells, reached) arrays of shape (bombs, 4, blast_range)
+    """
+    height, width = grid.shape[-2:]
+    xs = np.asarray(xs).reshape(-1, 1, 1)
+    ys = np.asarray(ys).reshape(-1, 1, 1)
+    steps = np.arange(1, blast_range + 1).reshape(1, 1, -1)
+    ray_x = xs + BLAST_DIRECTIONS[:, 0].reshape(1, -1, 1) * steps
+    ray_y = ys + BLAST_DIRECTIONS[:, 1].reshape(1, -1, 1) * steps
+
+    in_bounds = (ray_x >= 0) & (ray_x < width) & (ray_y >= 0) & (ray_y < height)
+    boards = ()
+    if games is not None:
+        boards = (np.broadcast_to(np.asarray(games).reshape(-1, 1, 1), ray_x.shape)[in_bounds],)
+    cells = np.full(ray_x.shape, WALL, dtype=grid.dtype)
+    cells[in_bounds] = grid[boards + (ray_y[in_bounds], ray_x[in_bounds])]
+
+    # A ray reaches a cell if every cell before it on the ray is empty
+    open_cells = cells == EMPTY
+    reached = np.ones(cells.shape, dtype=bool)
+    reached[..., 1:] = np.logical_and.accumulate(open_cells, axis=-1)[..., :-1]
+    reached &= cells != WALL
+    return ray_x, ray_y, cells, reached
+
+class BombWheel:
+    """
+    Timer wheel of live bombs, bucketed by the tick on which they detonate.
+
+    Advancing the clock only touches the bucket that is due, so the cost of
+    a tick does not depend on how many bombs are still ticking.
+    """
+
+    def __init__(self, bomb_timer=3):
+        self.bomb_timer = bomb_timer
+        self.clock = 0
+        self._buckets = defaultdict(list)
+        self._count = 0
+
+    def add(self, x, y, timer=0, owner=None):
+        # timer counts ticks already elapsed; the tick that follows a placement counts as the first
+        placed = self.clock - timer
+        detonation = max(placed + self.bomb_timer + 1, self.clock + 1)
+        self._buckets[detonation].append((x, y, placed, owner))
+        self._count += 1
+
+    def copy(self):
+        clone = BombWheel(self.bomb_timer)
+        clone.clock = self.clock
+        clone._buckets = defaultdict(list, {tick: list(bucket) for tick, bucket in self._buckets.items()})
+        clone._count = self._count
+        return clone
+
+    def advance(self):
+        """Advance the clock by one tick and return the (x, y, owner) of bombs now due."""
+        self.clock += 1
+        due = self._buckets.pop(self.clock, [])
+        self._count -= len(due)
+        return [(x, y, owner) for x, y, _, owner in due]
+
+    def __iter__(self):
+        # Yields (x, y, timer) with the timer counting ticks since placement
+        for bucket in self._buckets.values():
+            for x, y, placed, _ in bucket:
+                yield x, y, self.clock - placed
+
+    def __len__(self):
+        return self._count
 
 class Board:
-    def __init__(self, width, height):
+    def __init__(self, width, height, bomb_timer=3, rng=None):
         self.width = min(max(width, 15), 31)  # Ensure odd dimensions
         self.height = min(max(height, 15), 31)  # Ensure odd dimensions
+        self.rng = rng or random.Random()
         self.grid = self._create_grid()
-        self.bombs = []
+        self.bombs = BombWheel(bomb_timer)
 
     def _create_grid(self):
-        grid = [[' ' for _ in range(self.width)] for _ in range(self.height)]
-        
-        # Add walls around the edges
-        for i in range(self.height):
-            grid[i][0] = grid[i][-1] = '#'
-        for j in range(self.width):
-            grid[0][j] = grid[-1][j] = '#'
-        
-        # Add unbreakable stones to the grid
-        for i in range(2, self.height - 1, 2):
-            for j in range(2, self.width - 1, 2):
-                grid[i][j] = '#'
+        grid = wall_grid(self.height, self.width)
         
         # Add breakable stones randomly
         for i in range(1, self.height - 1):
             for j in range(1, self.width - 1):
-                if grid[i][j] == ' ' and random.random() < 0.3:
-                    grid[i][j] = 'S'
-        
-        # Ensure corners are clear for players
-        grid[1][1] = grid[1][2] = grid[2][1] = ' '
-        grid[1][-2] = grid[1][-3] = grid[2][-2] = ' '
-        grid[-2][1] = grid[-2][2] = grid[-3][1] = ' '
-        grid[-2][-2] = grid[-2][-3] = grid[-3][-2] = ' '
+                if grid[i, j] == EMPTY and self.rng.random() < 0.3:
+                    grid[i, j] = STONE
         
+        clear_corners(grid)
         return grid
 
+    def blast_cells(self, xs, ys, blast_range):
+        """Resolve the blast rays of bombs on this board; see blast_rays."""
+        return blast_rays(self.grid, xs, ys, blast_range)
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.grid = self.grid.copy()
+        clone.bombs = self.bombs.copy()
+        return clone
+
     def __str__(self):
-        return '\n'.join([''.join(row) for row in self.grid])
+        return '\n'.join([''.join(row) for row in CELL_CHARS[self.grid]])
 
 class Player:
     def __init__(self, id, x, y):
@@ -45,7 +157,12 @@ class Player:
         self.y = y
         self.score = 0
 
-    def move(self, direction, board):
+    def move(self, direction, board, occupancy=None):
+        """
+        Step one cell in `direction` if the target is free.
+
+        :param occupancy: Optional {(x, y): player ids} index; cells other players stand on block the move
+        """
         dx, dy = {
             'up': (0, -1),
             'down': (0, 1),
@@ -56,79 +173,322 @@ class Player:
 
         new_x = self.x + dx
         new_y = self.y + dy
-        if 0 <= new_x < board.width and 0 <= new_y < board.height and board.grid[new_y][new_x] in [' ', 'P']:
+        if 0 <= new_x < board.width and 0 <= new_y < board.height and board.grid[new_y, new_x] in (EMPTY, PLAYER) \
+                and (occupancy is None or (dx, dy) == (0, 0) or not occupancy.get((new_x, new_y))):
             self.x = new_x
             self.y = new_y
             return True
         return False
 
     def place_bomb(self, board):
-        if board.grid[self.y][self.x] != 'B':
-            board.bombs.append((self.x, self.y, 0))  # 0 is the initial bomb timer
+        if board.grid[self.y, self.x] != BOMB:
+            board.bombs.add(self.x, self.y, owner=self.id)
             return True
         return False
 
 class Game:
-    def __init__(self, width=15, height=15):
-        self.board = Board(width, height)
-        self.player = Player(1, 1, 1)
+    """
+    A board with one or more players; player 1 is the one the single-player API plays.
+
+    Players are kept in an occupancy index mapping each occupied (x, y) to
+    the ids standing there, so collisions and blast hits only look up the
+    cells a move or a blast touches, however many players are on the board.
+    Players block each other; the first four start in the corners and any
+    further ones on random free cells.
+    """
+
+    def __init__(self, width=15, height=15, seed=None, num_players=1):
+        self.seed = seed
+        self.rng = random.Random(seed)  # Same seed, same board
         self.bomb_timer = 3  # Bombs explode after 3 moves
+        self.board = Board(width, height, self.bomb_timer, self.rng)
+        if num_players < 1:
+            raise ValueError(f"A game needs at least one player, got {num_players}")
+        self.players = [Player(id, x, y) for id, (x, y) in enumerate(self._spawn_cells(num_players), start=1)]
+        self._index_players()
+        self.blast_range = 2
         self.move_counter = 0
+        self.history_length = 64  # Moves of cell changes kept for get_state_delta
+        self._changes = deque(maxlen=self.history_length)
+        self._pending_changes = set()
+        self.invalidate_render()
 
-    def move_player(self, direction):
-        print(f"DEBUG: Attempting to move {direction}")
-        move_success = self.player.move(direction, self.board)
-        self.move_counter += 1
-        self.update_bombs()
+    @property
+    def player(self):
+        return self.players[0]
+
+    def get_player(self, player_id):
+        if not 1 <= player_id <= len(self.players):
+            raise ValueError(f"Unknown player: {player_id}")
+        return self.players[player_id - 1]
+
+    def players_at(self, x, y):
+        """Return the ids of the players standing on (x, y)."""
+        return self.occupancy.get((x, y), ())
+
+    def _spawn_cells(self, num_players):
+        width, height = self.board.width, self.board.height
+        corners = [(1, 1), (width - 2, height - 2), (width - 2, 1), (1, height - 2)]
+        cells = corners[:num_players]
+        if num_players > len(corners):
+            free = [(int(x), int(y)) for y, x in np.argwhere(self.board.grid == EMPTY) if (x, y) not in corners]
+            if len(free) < num_players - len(corners):
+                raise ValueError(f"Not enough free cells for {num_players} players")
+            cells += self.rng.sample(free, num_players - len(corners))
+        return cells
+
+    def _index_players(self):
+        # Values are tuples, so fork() can share them and only copy the dict
+        self.occupancy = {}
+        for player in self.players:
+            cell = (player.x, player.y)
+            self.occupancy[cell] = self.occupancy.get(cell, ()) + (player.id,)
+
+    def _relocate(self, player, old_x, old_y):
+        ids = tuple(id for id in self.occupancy[(old_x, old_y)] if id != player.id)
+        if ids:
+            self.occupancy[(old_x, old_y)] = ids
+        else:
+            del self.occupancy[(old_x, old_y)]
+        cell = (player.x, player.y)
+        self.occupancy[cell] = self.occupancy.get(cell, ()) + (player.id,)
+
+    @classmethod
+    def from_state(cls, game_state, game_info=None, bombs=None):
+        """
+        Rebuild a Game from the board string and game info returned by the API.
+
+        Every 'P' on the board becomes a player; player 1 is the one at the
+        game info's player position, or the first 'P' without it.
+
+        :param bombs: Optional (x, y, timer) bomb list. Without it every 'B' on
+                      the board is assumed to go off on the next move.
+        """
+        cells = np.array([list(row) for row in game_state.split('\n')])
+        game = cls(cells.shape[1], cells.shape[0])
+        grid = np.full(cells.shape, EMPTY, dtype=np.int8)
+        grid[cells == '#'] = WALL
+        grid[cells == 'S'] = STONE
+        game.board.grid = grid
+
+        positions = [(int(x), int(y)) for y, x in np.argwhere(cells == 'P')]
+        position = re.search(r"Player Position: \((\d+), (\d+)\)", game_info or "")
+        if position and (int(position.group(1)), int(position.group(2))) in positions:
+            own = (int(position.group(1)), int(position.group(2)))
+            positions.remove(own)
+            positions.insert(0, own)
+        game.players = [Player(id, x, y) for id, (x, y) in enumerate(positions, start=1)]
+        game._index_players()
+        if bombs is None:
+            bombs = [(int(x), int(y), game.bomb_timer) for y, x in np.argwhere(cells == 'B')]
+        for x, y, timer in bombs:
+            game.board.bombs.add(x, y, timer)
+
+        if game_info:
+            info = re.match(r"Move: (\d+), Score: (-?\d+)", game_info)
+            if info:
+                game.move_counter, game.player.score = int(info.group(1)), int(info.group(2))
+        game.invalidate_render()
+        return game
+
+    def invalidate_render(self):
+        """Force the next get_game_state call to rebuild every row and drop recorded deltas."""
+        self._rendered = None
+        self._render_rows = [''] * self.board.height
+        self._dirty_rows = set(range(self.board.height))
+        self._changes.clear()
+
+    def snapshot(self):
+        """
+        Capture the game's mutable state in a compact tuple.
+
+        The snapshot shares nothing with the game, so it can be restored any
+        number of times with restore().
+        """
+        return (self.board.grid.copy(), self.board.bombs.copy(),
+                tuple((player.x, player.y, player.score) for player in self.players), self.move_counter)
+
+    def restore(self, snapshot):
+        grid, bombs, players, self.move_counter = snapshot
+        for player, (x, y, score) in zip(self.players, players):
+            player.x, player.y, player.score = x, y, score
+        self._index_players()
+        self.board.grid = grid.copy()
+        self.board.bombs = bombs.copy()
+        self._pending_changes = set()
+        self.invalidate_render()
+
+    def fork(self):
+        """Return an independent copy of the game for lookahead search."""
+        clone = copy.copy(self)
+        clone.board = self.board.copy()
+        clone.players = [copy.copy(player) for player in self.players]
+        clone.occupancy = dict(self.occupancy)
+        # The render cache carries over; the delta history belongs to the original
+        clone._render_rows = list(self._render_rows)
+        clone._dirty_rows = set(self._dirty_rows)
+        clone._changes = deque(maxlen=self.history_length)
+        clone._pending_changes = set()
+        return clone
+
+    def _mark_dirty(self, xs, ys):
+        cells = [(int(x), int(y)) for x, y in zip(xs, ys)]
+        self._pending_changes.update(cells)
+        self._dirty_rows.update(y for _, y in cells)
+
+    def _record_move(self):
+        self._changes.append((self.move_counter, self._pending_changes))
+        self._pending_changes = set()
+
+    @metrics.timed("move_player")
+    def move_player(self, direction, player_id=1):
+        move_success = self._move(self.get_player(player_id), direction)
+        self._tick()
+        return move_success
+
+    def place_bomb(self, player_id=1):
+        bomb_placed = self._place_bomb(self.get_player(player_id))
+        self._tick()
+        return bomb_placed
+
+    def apply_command(self, command, player_id=1):
+        """Play one agent command: 'bomb' or a direction accepted by move_player."""
+        if command == 'bomb':
+            return self.place_bomb(player_id)
+        return self.move_player(command, player_id)
+
+    def step(self, commands):
+        """
+        Play one command for each of several players, then advance the bombs once.
+
+        :param commands: {player id: command}; commands are applied in player id order
+        :return: {player id: whether the command succeeded}
+        """
+        players = {player_id: self.get_player(player_id) for player_id in commands}  # Unknown ids fail before any move
+        results = {}
+        for player_id in sorted(commands):
+            player = players[player_id]
+            if commands[player_id] == 'bomb':
+                results[player_id] = self._place_bomb(player)
+            else:
+                results[player_id] = self._move(player, commands[player_id])
+        self._tick()
+        return results
+
+    def _move(self, player, direction):
+        logger.debug("Player %d attempting to move %s", player.id, direction)
+        old_x, old_y = player.x, player.y
+        move_success = player.move(direction, self.board, self.occupancy)
         if move_success:
-            print(f"DEBUG: Player moved to ({self.player.x}, {self.player.y})")
+            self._relocate(player, old_x, old_y)
+            self._mark_dirty([old_x, player.x], [old_y, player.y])
+            logger.debug("Player %d moved to (%d, %d)", player.id, player.x, player.y)
         else:
-            print(f"DEBUG: Player move failed")
+            metrics.count("failed_moves")
+            logger.debug("Player %d move failed", player.id)
         return move_success
 
-    def place_bomb(self):
-        bomb_placed = self.player.place_bomb(self.board)
+    def _place_bomb(self, player):
+        bomb_placed = player.place_bomb(self.board)
+        if bomb_placed:
+            metrics.count("bombs_placed")
+            self._mark_dirty([player.x], [player.y])
+        return bomb_placed
+
+    def _tick(self):
         self.move_counter += 1
         self.update_bombs()
-        return bomb_placed
+        self._record_move()
 
+    @metrics.timed("update_bombs")
     def update_bombs(self):
-        exploded_bombs = []
-        for bomb in self.board.bombs:
-            x, y, timer = bomb
-            if timer >= self.bomb_timer:
-                self._explode_bomb(x, y)
-                exploded_bombs.append(bomb)
-            else:
-                self.board.bombs[self.board.bombs.index(bomb)] = (x, y, timer + 1)
-        for bomb in exploded_bombs:
-            self.board.bombs.remove(bomb)
-
-    def _explode_bomb(self, x, y):
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        for dx, dy in directions:
-            for i in range(1, 3):  # Explosion range of 2
-                new_x, new_y = x + i*dx, y + i*dy
-                if 0 <= new_x < self.board.width and 0 <= new_y < self.board.height:
-                    if self.board.grid[new_y][new_x] == '#':
-                        break
-                    elif self.board.grid[new_y][new_x] == 'S':
-                        self.board.grid[new_y][new_x] = ' '
-                        self.player.score += 10
-                        break
-                    elif new_x == self.player.x and new_y == self.player.y:
-                        self.player.score -= 50  # Player hit by explosion
-                else:
-                    break
-        self.board.grid[y][x] = ' '  # Remove the exploded bomb
+        exploding = self.board.bombs.advance()
+        if exploding:
+            xs, ys, owners = zip(*exploding)
+            self._explode_bombs(np.array(xs), np.array(ys), owners)
+
+    @metrics.timed("explode_bomb")  # One call resolves every bomb going off on a tick
+    def _explode_bombs(self, xs, ys, owners=None):
+        """
+        :param owners: Id of the player who placed each bomb; None (or a None
+                       entry) credits player 1, as bombs rebuilt from a board do
+        """
+        metrics.count("bombs_exploded", len(xs))
+        grid = self.board.grid
+        ray_x, ray_y, cells, reached = self.board.blast_cells(xs, ys, self.blast_range)
 
+        # Stones stop the ray; each destroyed stone scores once, for the owner of the first bomb reaching it
+        stones = reached & (cells == STONE)
+        stone_x, stone_y = ray_x[stones], ray_y[stones]
+        destroyed, first = np.unique(stone_y * self.board.width + stone_x, return_index=True)
+        grid.flat[destroyed] = EMPTY
+        if len(destroyed):
+            owners = np.array([owner or 1 for owner in owners] if owners is not None else [1] * len(xs))
+            credited, counts = np.unique(owners[np.nonzero(stones)[0][first]], return_counts=True)
+            for owner, count in zip(credited.tolist(), counts.tolist()):
+                self.get_player(owner).score += 10 * count
+
+        # Every ray passing over a player costs that player points
+        open_cells = reached & (cells == EMPTY)
+        for x, y in zip(ray_x[open_cells].tolist(), ray_y[open_cells].tolist()):
+            for player_id in self.occupancy.get((x, y), ()):
+                self.players[player_id - 1].score -= 50
+
+        grid[ys, xs] = EMPTY  # Remove the exploded bombs
+        self._mark_dirty(xs, ys)
+        self._mark_dirty(destroyed % self.board.width, destroyed // self.board.width)
+
+    def blast_zone(self):
+        """Return a (height, width) boolean mask of cells the live bombs' blasts will reach."""
+        zone = np.zeros(self.board.grid.shape, dtype=bool)
+        bombs = list(self.board.bombs)
+        if bombs:
+            xs, ys, _ = zip(*bombs)
+            ray_x, ray_y, _, reached = self.board.blast_cells(np.array(xs), np.array(ys), self.blast_range)
+            zone[ray_y[reached], ray_x[reached]] = True
+        return zone
+
+    @metrics.timed("get_game_state")
     def get_game_state(self):
-        game_state = [row[:] for row in self.board.grid]  # Create a copy of the grid
-        for bomb in self.board.bombs:
-            x, y, _ = bomb
-            game_state[y][x] = 'B'
-        game_state[self.player.y][self.player.x] = 'P'
-        return '\n'.join([''.join(row) for row in game_state])
-
-    def get_game_info(self):
-        return f"Move: {self.move_counter}, Score: {self.player.score}, Player Position: ({self.player.x}, {self.player.y})"
+        # Only rows touched since the last call are re-rendered
+        if self._rendered is not None and not self._dirty_rows:
+            return self._rendered
+
+        dirty = self._dirty_rows
+        rows = {y: CELL_CHARS[self.board.grid[y]] for y in dirty}  # Character copies of the dirty rows
+        for x, y, _ in self.board.bombs:
+            if y in rows:
+                rows[y][x] = 'B'
+        for x, y in self.occupancy:
+            if y in rows:
+                rows[y][x] = 'P'
+        for y, row in rows.items():
+            self._render_rows[y] = ''.join(row)
+
+        dirty.clear()
+        self._rendered = '\n'.join(self._render_rows)
+        return self._rendered
+
+    def get_state_delta(self, since):
+        """
+        Return the board cells that changed after move `since`.
+
+        :param since: Move counter of the board the caller already has
+        :return: List of (x, y, char) with the current character of every
+                 changed cell, or None if the changes are no longer recorded
+                 and the caller needs the full board
+        """
+        if since == self.move_counter:
+            return []
+        if since > self.move_counter or not self._changes or self._changes[0][0] > since + 1:
+            return None
+        cells = set()
+        for move, changed in self._changes:
+            if move > since:
+                cells.update(changed)
+        self.get_game_state()  # Bring the rendered rows up to date
+        return [(x, y, self._render_rows[y][x]) for x, y in sorted(cells)]
+
+    def get_game_info(self, player_id=1):
+        player = self.get_player(player_id)
+        return f"Move: {self.move_counter}, Score: {player.score}, Player Position: ({player.x}, {player.y})"
@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+
+from game import Game
+
+class GameSession:
+    def __init__(self, game_id, game, pinned=False):
+        self.game_id = game_id
+        self.game = game
+        self.lock = threading.Lock()  # Serializes commands against this game
+        self.pinned = pinned  # Pinned sessions are never evicted
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def info(self):
+        return {
+            "game_id": self.game_id,
+            "width": self.game.board.width,
+            "height": self.game.board.height,
+            "seed": self.game.seed,
+            "move_counter": self.game.move_counter,
+            "score": self.game.player.score,
+            "players": len(self.game.players),
+            "idle_seconds": round(time.monotonic() - self.last_used, 3),
+        }
+
+class GameRegistry:
+    """
+    Thread-safe registry of concurrent games keyed by game id.
+
+    Games that have not been used for `idle_timeout` seconds are evicted
+    lazily, at most once every `sweep_interval` seconds, whenever the
+    registry is accessed.
+    """
+
+    def __init__(self, idle_timeout=600, sweep_interval=30):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def create(self, width=15, height=15, game_id=None, pinned=False, seed=None, players=1):
+        session = GameSession(game_id or uuid.uuid4().hex, Game(width, height, seed, players), pinned)
+        with self._lock:
+            if session.game_id in self._sessions:
+                raise ValueError(f"Game {session.game_id} already exists")
+            self._sessions[session.game_id] = session
+        self._maybe_sweep()
+        return session
+
+    def get(self, game_id):
+        self._maybe_sweep()
+        with self._lock:
+            session = self._sessions.get(game_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def delete(self, game_id):
+        with self._lock:
+            return self._sessions.pop(game_id, None) is not None
+
+    def list(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [session.info() for session in sessions]
+
+    def evict_idle(self):
+        """Drop idle, unpinned games and return their ids."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        with self._lock:
+            for game_id, session in list(self._sessions.items()):
+                # Skip games that are mid-command even if they look idle
+                if session.pinned or session.last_used > cutoff or session.lock.locked():
+                    continue
+                del self._sessions[game_id]
+                evicted.append(game_id)
+            self._last_sweep = time.monotonic()
+        return evicted
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.evict_idle()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -1,104 +1,275 @@
+from collections import deque
+
 import numpy as np
 
+from board_parser import BoardParser
+from metrics import metrics
+
+PASSABLE = [' ', 'P', 'B']  # The player can walk over bombs
+
 class GameStateProcessor:
     def __init__(self):
         self.directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]  # up, down, left, right
         self.move_map = {(0, -1): "up", (0, 1): "down", (-1, 0): "left", (1, 0): "right"}
+        self.bomb_timer = 3  # Moves between placing a bomb and its explosion
+        self.blast_range = 2
+        self.plan_length = 10
+        self.parser = BoardParser()  # Reuses the previous board when only a few cells changed
+
+    @metrics.timed("process_game_state")
+    def process_game_state(self, game_state, game_info, bombs=None):
+        """
+        Plan the next moves for a game state.
 
-    def process_game_state(self, game_state, game_info):
+        :param game_state: Board string as returned by the API
+        :param game_info: Game info string as returned by the API
+        :param bombs: Optional (x, y, timer) bomb list, e.g. from state_codec.decode_state.
+                      Without it every 'B' may go off on any of the next few moves.
+        :return: List of 10 commands
+        """
         # Convert game state string to 2D numpy array
-        state_array = np.array([list(row) for row in game_state.split('\n')])
-        
-        # Extract player position
-        player_pos = np.where(state_array == 'P')
-        player_pos = (player_pos[0][0], player_pos[1][0])
-
-        # Find nearest stone
-        stone_positions = np.where(state_array == 'S')
-        if len(stone_positions[0]) > 0:
-            distances = [self._manhattan_distance(player_pos, (y, x)) for y, x in zip(stone_positions[0], stone_positions[1])]
-            nearest_stone = (stone_positions[0][np.argmin(distances)], stone_positions[1][np.argmin(distances)])
-        else:
-            nearest_stone = None
-
-        # Compute safe moves
-        safe_moves = self._get_safe_moves(state_array, player_pos)
+        state_array = self.parser.parse(game_state)
+        player_pos = self.parser.player_pos
+
+        # When each cell will be inside a blast
+        danger = self._blast_ticks(state_array, bombs)
 
         # Decide on the next 10 moves
-        moves = self._plan_moves(state_array, player_pos, nearest_stone, safe_moves)
+        moves = self._plan_moves(state_array, player_pos, danger)
 
         return moves
 
-    def _manhattan_distance(self, pos1, pos2):
-        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-
-    def _get_safe_moves(self, state_array, player_pos):
+    def _get_safe_moves(self, alive, player_pos, tick=1):
+        # Moves whose destination keeps the player clear of every blast at the end of move `tick`
         safe_moves = []
         for dx, dy in self.directions:
             new_pos = (player_pos[0] + dy, player_pos[1] + dx)
-            if (0 <= new_pos[0] < state_array.shape[0] and
-                0 <= new_pos[1] < state_array.shape[1] and
-                state_array[new_pos] in [' ', 'S']):
+            if (0 <= new_pos[0] < alive.shape[1] and
+                0 <= new_pos[1] < alive.shape[2] and
+                self._is_safe(alive, new_pos, tick)):
                 safe_moves.append(self.move_map[(dx, dy)])
         return safe_moves
 
-    def _plan_moves(self, state_array, player_pos, nearest_stone, safe_moves):
+    def _blast_mask(self, board, rows, cols):
+        """Return a mask of the cells hit by bombs at (rows, cols), including the bombs' own cells."""
+        steps = np.arange(1, self.blast_range + 1).reshape(1, 1, -1)
+        offsets = np.array(self.directions)
+        ray_y = np.asarray(rows).reshape(-1, 1, 1) + offsets[:, 1].reshape(1, -1, 1) * steps
+        ray_x = np.asarray(cols).reshape(-1, 1, 1) + offsets[:, 0].reshape(1, -1, 1) * steps
+
+        in_bounds = (ray_y >= 0) & (ray_y < board.shape[0]) & (ray_x >= 0) & (ray_x < board.shape[1])
+        cells = np.full(ray_y.shape, '#')
+        cells[in_bounds] = board[ray_y[in_bounds], ray_x[in_bounds]]
+
+        # A ray reaches a cell if every cell before it on the ray is passable
+        reached = np.ones(cells.shape, dtype=bool)
+        reached[..., 1:] = np.logical_and.accumulate(np.isin(cells, PASSABLE), axis=-1)[..., :-1]
+        reached &= cells != '#'
+
+        mask = np.zeros(board.shape, dtype=bool)
+        mask[ray_y[reached], ray_x[reached]] = True
+        mask[rows, cols] = True
+        return mask
+
+    def _blast_ticks(self, board, bombs=None):
+        """
+        Danger map: for every cell, a bitmask of the ticks on which it is inside a blast.
+
+        Bit t is set if a live bomb's blast covers the cell at the end of the
+        t-th move from now. Bombs going off on the same tick are resolved
+        together, and the stones they destroy no longer block later blasts.
+        A bomb's own cell counts as inside its blast.
+        """
+        board = board.copy()
+        ticks = np.zeros(board.shape, dtype=np.int64)
+        if bombs is None:
+            # Unknown timers: any bomb may go off on any tick until its fuse runs out
+            rows, cols = np.nonzero(board == 'B')
+            if len(rows):
+                all_ticks = sum(1 << tick for tick in range(1, self.bomb_timer + 2))
+                ticks[self._blast_mask(board, rows, cols)] |= all_ticks
+            return ticks
+
+        by_tick = {}
+        for x, y, timer in bombs:
+            by_tick.setdefault(max(self.bomb_timer + 1 - timer, 1), []).append((y, x))
+        for tick in sorted(by_tick):
+            rows, cols = zip(*by_tick[tick])
+            mask = self._blast_mask(board, list(rows), list(cols))
+            ticks[mask] |= 1 << tick
+            board[mask & (board == 'S')] = ' '
+        return ticks
+
+    def _survivable(self, board, danger):
+        """
+        Work backwards from the danger map to the cells that still allow survival.
+
+        alive[t] marks the cells where the player can stand at the end of move
+        t and still dodge every later blast. Past the last blast every
+        passable cell is alive, which is the last entry.
+        """
+        passable = np.isin(board, PASSABLE)
+        horizon = int(danger.max()).bit_length()
+        alive = np.zeros((horizon + 1,) + board.shape, dtype=bool)
+        alive[horizon] = passable
+        for tick in range(horizon - 1, -1, -1):
+            reachable = alive[tick + 1].copy()
+            for dx, dy in self.directions:
+                reachable |= self._shifted(alive[tick + 1], dy, dx)
+            alive[tick] = passable & reachable & ((danger >> tick) & 1 == 0)
+        return alive
+
+    def _is_safe(self, alive, cell, tick):
+        return alive[min(tick, len(alive) - 1)][cell]
+
+    def _distance_field(self, passable, sources):
+        """
+        Multi-source BFS over passable cells.
+
+        :param passable: Boolean array of cells the player can stand on
+        :param sources: (row, col) cells at distance 0
+        :return: Integer array of path distances to the nearest source, -1 where unreachable
+        """
+        height, width = passable.shape
+        open_cells = passable.tolist()
+        dist = [[-1] * width for _ in range(height)]
+        queue = deque()
+        for y, x in sources:
+            dist[y][x] = 0
+            queue.append((y, x))
+        while queue:
+            y, x = queue.popleft()
+            for dx, dy in self.directions:
+                ny, nx = y + dy, x + dx
+                if 0 <= ny < height and 0 <= nx < width and open_cells[ny][nx] and dist[ny][nx] < 0:
+                    dist[ny][nx] = dist[y][x] + 1
+                    queue.append((ny, nx))
+        return np.array(dist)
+
+    def _shifted(self, mask, dy, dx):
+        # out[y, x] = mask[y + dy, x + dx], False outside the board
+        height, width = mask.shape
+        out = np.zeros_like(mask)
+        out[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)] = \
+            mask[max(dy, 0):height - max(-dy, 0), max(dx, 0):width - max(-dx, 0)]
+        return out
+
+    def _bomb_spots(self, board):
+        """Return a mask of passable cells where a bomb would destroy at least one stone."""
+        passable = np.isin(board, PASSABLE)
+        stones = board == 'S'
+        spots = np.zeros(board.shape, dtype=bool)
+        for dx, dy in self.directions:
+            clear = np.ones(board.shape, dtype=bool)  # Ray still travelling at this step
+            for step in range(1, self.blast_range + 1):
+                spots |= clear & self._shifted(stones, step * dy, step * dx)
+                clear &= self._shifted(passable, step * dy, step * dx)
+        return spots & passable
+
+    def _escape_route(self, pos, tick, alive):
+        """
+        Find moves that keep the player alive until the bomb at pos goes off.
+
+        :param pos: Cell the bomb was placed on at `tick`; the player stands on it
+        :param alive: Survivable cells for the danger map that includes the new bomb
+        :return: List of bomb_timer moves (passes included), or None if none is safe
+        """
+        if not self._is_safe(alive, pos, tick):
+            return None
+        # Prefer moving off early; alive cells always have an alive successor
+        options = [(move, delta) for delta, move in self.move_map.items()] + [("pass", (0, 0))]
+        route = []
+        current = pos
+        for step_tick in range(tick + 1, tick + self.bomb_timer + 1):
+            for move, (dx, dy) in options:
+                cell = (current[0] + dy, current[1] + dx)
+                if self._is_safe(alive, cell, step_tick):
+                    route.append(move)
+                    current = cell
+                    break
+        return route
+
+    def _safe_step(self, current, tick, alive):
+        # Stay put if that keeps the player alive, otherwise take any move that does
+        if self._is_safe(alive, current, tick):
+            return "pass", current
+        safe_moves = self._get_safe_moves(alive, current, tick)
+        if not safe_moves:
+            return "pass", current
+        dx, dy = self._get_direction_from_move(safe_moves[0])
+        return safe_moves[0], (current[0] + dy, current[1] + dx)
+
+    def _step_downhill(self, dist, current):
+        # Move to the neighbour one step closer to the field's sources
+        for dx, dy in self.directions:
+            cell = (current[0] + dy, current[1] + dx)
+            if 0 <= cell[0] < dist.shape[0] and 0 <= cell[1] < dist.shape[1] and dist[cell] == dist[current] - 1:
+                return self.move_map[(dx, dy)], cell
+        return "pass", current
+
+    def _plan_moves(self, state_array, player_pos, danger):
+        board = state_array.copy()  # Local copy the plan's own explosions are applied to
+        board[player_pos] = ' '
+        danger = danger.copy()  # The plan's own bombs are added as they are placed
+        alive = self._survivable(board, danger)
         moves = []
-        current_pos = player_pos
-
-        for _ in range(10):
-            if nearest_stone:
-                # Check if we're next to a breakable stone
-                if self._manhattan_distance(current_pos, nearest_stone) == 1:
-                    # Place a bomb
-                    moves.append("bomb")
-                    # Move away from the bomb
-                    for safe_move in safe_moves:
-                        dx, dy = self._get_direction_from_move(safe_move)
-                        new_pos = (current_pos[0] + dy, current_pos[1] + dx)
-                        if state_array[new_pos] == ' ':
-                            moves.append(safe_move)
-                            current_pos = new_pos
-                            break
-                    else:
-                        moves.append("pass")  # If no safe move, pass
-                    nearest_stone = None  # Reset nearest stone after bombing
-                else:
-                    # Move towards the nearest stone
-                    dy = np.sign(nearest_stone[0] - current_pos[0])
-                    dx = np.sign(nearest_stone[1] - current_pos[1])
-                    move = self.move_map.get((dx, dy))
-                    
-                    if move in safe_moves:
-                        moves.append(move)
-                        current_pos = (current_pos[0] + dy, current_pos[1] + dx)
-                    else:
-                        # If can't move directly towards stone, choose a random safe move
-                        random_move = np.random.choice(safe_moves) if safe_moves else "pass"
-                        moves.append(random_move)
-                        if random_move != "pass":
-                            dx, dy = self._get_direction_from_move(random_move)
-                            current_pos = (current_pos[0] + dy, current_pos[1] + dx)
-            else:
-                # If no stones left, move towards the bottom-right corner
-                dy = 1 if current_pos[0] < state_array.shape[0] - 2 else 0
-                dx = 1 if current_pos[1] < state_array.shape[1] - 2 else 0
-                move = self.move_map.get((dx, dy))
-                
-                if move in safe_moves:
-                    moves.append(move)
-                    current_pos = (current_pos[0] + dy, current_pos[1] + dx)
-                else:
-                    moves.append(np.random.choice(safe_moves) if safe_moves else "pass")
+        current = player_pos
+        unusable = set()  # Bomb spots with no safe escape
+        dist = None
 
-            # Find new nearest stone if needed
-            if nearest_stone is None:
-                stone_positions = np.where(state_array == 'S')
-                if len(stone_positions[0]) > 0:
-                    distances = [self._manhattan_distance(current_pos, (y, x)) for y, x in zip(stone_positions[0], stone_positions[1])]
-                    nearest_stone = (stone_positions[0][np.argmin(distances)], stone_positions[1][np.argmin(distances)])
+        while len(moves) < self.plan_length:
+            tick = len(moves) + 1  # Tick at the end of the next move
+            if dist is None:
+                # Path distance from every cell to the nearest spot where a bomb destroys a stone
+                spots = self._bomb_spots(board)
+                for cell in unusable:
+                    spots[cell] = False
+                passable = np.isin(board, PASSABLE)
+                dist = self._distance_field(passable, zip(*np.nonzero(spots)))
 
-        return moves
+            if dist[current] == 0:
+                blast = self._blast_mask(board, [current[0]], [current[1]])
+                bomb_danger = danger.copy()
+                bomb_danger[blast] |= 1 << (tick + self.bomb_timer)
+                bomb_alive = self._survivable(board, bomb_danger)
+                escape = self._escape_route(current, tick, bomb_alive)
+                if escape is None:
+                    unusable.add(current)
+                    dist = None
+                    continue
+                if tick + self.bomb_timer > self.plan_length:
+                    # Never end a plan inside our own blast; bomb at the start of the next one
+                    move, current = self._safe_step(current, tick, alive)
+                    moves.append(move)
+                    continue
+                # Place a bomb, get out of the blast and wait for it to go off
+                moves.append("bomb")
+                for move in escape:
+                    dx, dy = self._get_direction_from_move(move)
+                    current = (current[0] + dy, current[1] + dx)
+                moves.extend(escape)
+                danger = bomb_danger
+                board[blast & (board == 'S')] = ' '
+                alive = self._survivable(board, danger)
+                dist = None
+            elif dist[current] > 0:
+                # Move towards the nearest bomb spot by path distance, unless that step is in a blast
+                move, cell = self._step_downhill(dist, current)
+                if not self._is_safe(alive, cell, tick):
+                    move, cell = self._safe_step(current, tick, alive)
+                moves.append(move)
+                current = cell
+            else:
+                # If no stones are reachable, move towards the bottom-right corner
+                corner = (board.shape[0] - 2, board.shape[1] - 2)
+                corner_dist = self._distance_field(passable, [corner])
+                move, cell = ("pass", current) if corner_dist[current] <= 0 else self._step_downhill(corner_dist, current)
+                if not self._is_safe(alive, cell, tick):
+                    move, cell = self._safe_step(current, tick, alive)
+                moves.append(move)
+                current = cell
+
+        return moves[:self.plan_length]
 
     def _get_direction_from_move(self, move):
-        return next((k for k, v in self.move_map.items() if v == move), (0, 0))
\ No newline at end of file
+        return next((k for k, v in self.move_map.items() if v == move), (0, 0))
@@ -1,13 +1,31 @@
 from openai import OpenAI
+import asyncio
 import json
-import time
+import sys
+import os
 import requests
+from agent_runtime import AgentRuntime
+from game import Game
+from plan_cache import PlanCache
+from plan_validator import validate_plan
+from prompt_encoding import encode_board
 from game_state_processor import GameStateProcessor
+from replan_controller import ReplanController
+from search_planner import SearchPlanner
+from state_mirror import BoardMirror
 
 BASE_URL = "http://localhost:5000"
 
 client = OpenAI()
-game_processor = GameStateProcessor()
+# BOMBERMAN_BOARD_ENCODING picks how the board is written into prompts: ascii, rle, coords or viewport
+BOARD_ENCODING = os.environ.get("BOMBERMAN_BOARD_ENCODING", "ascii")
+# Bump the prompt version whenever the prompts below change
+plan_cache = PlanCache(f"gpt-insights-1-{BOARD_ENCODING}", path=os.environ.get("BOMBERMAN_PLAN_CACHE"))
+# BOMBERMAN_PLANNER=search swaps in the beam search planner
+if os.environ.get("BOMBERMAN_PLANNER") == "search":
+    game_processor = SearchPlanner()
+else:
+    game_processor = GameStateProcessor()
 
 def print_game_state(game_state, game_info, debug_info):
     print("\nCurrent Game State:")
@@ -60,7 +78,7 @@ Your moves will be determined by a game state processor. Your role is to analyze
         """},
         {"role": "user", "content": f"""
 Current game state:
-{game_state}
+{encode_board(game_state, BOARD_ENCODING)}
 
 Game info:
 {game_info}
@@ -71,13 +89,18 @@ Analyze the current game state and provide strategic insights. The game state pr
         """}
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        tools=tools,
-        tool_choice="auto",
-        max_tokens=500,
-    )
+    def ask_openai():
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            max_tokens=500,
+        )
+        return response.choices[0].message.content or ""
+
+    # Identical board, score and last move reuse the earlier insights instead of calling the model
+    insights = plan_cache.get_or_compute(plan_cache.key(game_state, game_info, last_move), ask_openai)
 
     # Process the game state and get the moves
     suggested_moves = game_processor.process_game_state(game_state, game_info)
@@ -88,70 +111,87 @@ Analyze the current game state and provide strategic insights. The game state pr
         "arguments": json.dumps({"moves": suggested_moves})
     }
 
-    return response.choices[0].message, function_call
+    return insights, function_call
+
+def execute_plan(body):
+    """Run a /plan request body on the server and return the response data, or None on error."""
+    response = requests.post(f"{BASE_URL}/plan", json=body)
+    if response.status_code != 200:
+        print(f"Error executing plan: {response.status_code}")
+        return None
+    data = response.json()
+    for step in data["steps"]:
+        print(f"Executed {step['command']}: {step['success']}")
+    if data["stopped_by"]:
+        print(f"Plan stopped early: {data['stopped_by']}")
+    print(f"Debug Info: {data['debug_info']}")
+    return data
 
 def main():
     last_move = "None"
     move_counter = 0
-    plan = []
+    mirror = BoardMirror()
+    # Plans are kept until the game stops matching them, instead of being replaced after every request
+    controller = ReplanController()
 
     while True:
         # Get the current game state
-        response = requests.get(f"{BASE_URL}/state")
+        response = requests.get(f"{BASE_URL}/state", params=mirror.query())
         if response.status_code == 200:
             data = response.json()
-            game_state = data["game_state"]
+            game_state = mirror.apply(data)
             game_info = data["game_info"]
             debug_info = data["debug_info"]
             print_game_state(game_state, game_info, debug_info)
         else:
             print(f"Error getting game state: {response.status_code}")
             break
-
-        # Get command from openai_command if we don't have a plan or have exhausted the current plan
-        if not plan:
-            _, function_call = openai_command(game_state, game_info, last_move)
-            if function_call["name"] == "make_moves":
-                plan = json.loads(function_call["arguments"])["moves"]
-                print(f"New plan: {plan}")
+        if controller.sync(game_state):
+            print(f"Game diverged from the plan: {controller.last_divergence}")
+
+        if controller.needs_plan():
+            if controller.plans == 0 or controller.last_divergence is not None:
+                # Only a divergence is worth new insights from the model
+                _, function_call = openai_command(game_state, game_info, last_move)
+                if function_call["name"] != "make_moves":
+                    print("Error: No valid function call in the response")
+                    break
+                moves = json.loads(function_call["arguments"])["moves"]
             else:
-                print("Error: No valid function call in the response")
-                break
-
-        # Execute the next move in the plan
-        command = plan.pop(0)
-        print(f"Executing command: {command}")
-
-        if command in ["up", "down", "left", "right", "pass"]:
-            response = requests.post(f"{BASE_URL}/move", json={"direction": command})
-            last_move = command
-        elif command == "bomb":
-            response = requests.post(f"{BASE_URL}/bomb")
-            last_move = "bomb"
-
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Move result: {data['success']}")
-            print(f"Debug Info: {data['debug_info']}")
-        else:
-            print(f"Error: {response.status_code}")
-            # Clear the plan if there's an error
-            plan = []
-
-        move_counter += 1
-        if move_counter % 10 == 0:
-            print(f"Completed 10 moves.")
-            # Clear the plan to get a new one every 10 moves
-            plan = []
-
-        time.sleep(0.1)  # Add a small delay to prevent overwhelming the server
+                # The last plan ran as expected; the game state processor continues on its own
+                moves = game_processor.process_game_state(game_state, game_info, mirror.bombs)
+            controller.adopt(validate_plan(Game.from_state(game_state, game_info, mirror.bombs), moves))
+            print(f"New plan: {moves}")
+            print(f"Plan cache: {plan_cache.stats()}")
+
+        # Execute the pending commands in one request; after an error they stay pending and are retried
+        data = execute_plan(controller.request())
+        if data is not None:
+            mirror.apply(data)
+            if controller.update(data):
+                print(f"Game diverged from the plan: {controller.last_divergence}")
+            last_move = data["steps"][-1]["command"]
+            move_counter += data["executed"]
+            print(f"Completed {move_counter} moves. Replanning: {controller.stats()}")
 
         # Check if the game is over
         if "Game Over" in game_info:
             print("Game Over!")
             break
 
+def async_main():
+    def plan(game_state, game_info, last_move):
+        _, function_call = openai_command(game_state, game_info, last_move)
+        return json.loads(function_call["arguments"])["moves"]
+
+    stats = asyncio.run(AgentRuntime(plan, BASE_URL, plan_cache=plan_cache).run())
+    print(f"Runtime stats: {stats}")
+    print(f"Plan cache: {plan_cache.stats()}")
+
 if __name__ == "__main__":
     print("Bomberman GPT API with Game State Processor")
     print("-------------------------------------------")
-    main()
+    if "--async" in sys.argv:
+        async_main()
+    else:
+        main()
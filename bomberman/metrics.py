@@ -0,0 +1,70 @@
+import functools
+import os
+import threading
+import time
+
+class Metrics:
+    """
+    Named counters and timers for the game server and planners, off unless enabled.
+
+    timed() wraps hot-path functions; while metrics are disabled the wrapper
+    only checks one flag before calling through. Set BOMBERMAN_METRICS=1 or
+    call enable() to start collecting, and render() for the Prometheus text
+    exposition format served by /metrics.
+    """
+
+    def __init__(self, prefix="bomberman", enabled=False):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}  # name -> [calls, total seconds, slowest call in seconds]
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def timed(self, name):
+        """Decorator recording every call of the function under timer `name`."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, (calls, total, slowest) in sorted(self.timers.items()):
+                metric = f"{self.prefix}_{name}_seconds"
+                lines += [f"# TYPE {metric} summary", f"{metric}_count {calls}", f"{metric}_sum {total:.9f}",
+                          f"# TYPE {metric}_max gauge", f"{metric}_max {slowest:.9f}"]
+            return '\n'.join(lines) + '\n'
+
+metrics = Metrics(enabled=os.environ.get("BOMBERMAN_METRICS") == "1")
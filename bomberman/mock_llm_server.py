@@ -0,0 +1,249 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+from game_state_processor import GameStateProcessor
+from prompt_encoding import estimate_tokens
+
+app = Flask(__name__)
+
+COMMANDS = ['up', 'down', 'left', 'right', 'pass', 'bomb']
+STREAM_CHUNK_CHARS = 8  # Roughly two tokens per streamed delta
+# The board the agents send when BOMBERMAN_BOARD_ENCODING is ascii
+BOARD_PATTERN = re.compile(r"Current game state:\n(.*?)\n\nGame info:", re.S)
+
+class LatencyModel:
+    """
+    Response delays drawn from a distribution given as "<kind>:<parameters>".
+
+    fixed:0.5           always 0.5 seconds
+    uniform:0.2,1.5     uniform between 0.2 and 1.5 seconds
+    normal:0.8,0.2      mean 0.8, standard deviation 0.2, never below 0
+    lognormal:-0.5,0.4  exp of a normal with mu -0.5 and sigma 0.4; long tail like real APIs
+    """
+
+    def __init__(self, spec="fixed:0", rng=None):
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(param) for param in params.split(',') if param]
+        self.rng = rng or random.Random()
+        samplers = {
+            'fixed': lambda: self.params[0] if self.params else 0.0,
+            'uniform': lambda: self.rng.uniform(*self.params),
+            'normal': lambda: max(self.rng.gauss(*self.params), 0.0),
+            'lognormal': lambda: self.rng.lognormvariate(*self.params),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.sample = samplers[kind]
+
+class MockLLM:
+    """
+    Canned LLM behaviour shared by the Anthropic and OpenAI routes.
+
+    Plans come from `plans` in order (cycled) when given, otherwise from
+    `plan_source`: "random" draws valid commands, "processor" runs
+    GameStateProcessor on the ASCII board found in the prompt. A fraction
+    `malformed_rate` of responses is deliberately broken JSON.
+    Everything random is drawn from one seeded generator, so a run with the
+    same seed and the same requests gives the same answers.
+    """
+
+    def __init__(self, latency="fixed:0", malformed_rate=0.0, plans=None, plan_source="random", plan_length=10,
+                 seed=None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.malformed_rate = malformed_rate
+        self.plans = itertools.cycle(plans) if plans else None
+        self.plan_source = plan_source
+        self.plan_length = plan_length
+        self.processor = GameStateProcessor()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.malformed = 0
+        self.seconds_delayed = 0.0
+
+    def respond(self, prompt, valid_moves=None):
+        """
+        Decide on a plan for a prompt and draw its latency.
+
+        :param valid_moves: Commands the caller allows, e.g. a tool's enum
+        :return: (request number, plan, malformed, seconds the response should take)
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency.sample()
+            malformed = self.rng.random() < self.malformed_rate
+            self.malformed += malformed
+            self.seconds_delayed += delay
+            plan = self._next_plan(prompt, valid_moves or COMMANDS)
+            return self.requests, plan, malformed, delay
+
+    def _next_plan(self, prompt, valid_moves):
+        if self.plans is not None:
+            return list(next(self.plans))
+        board = BOARD_PATTERN.search(prompt)
+        if self.plan_source == "processor" and board:
+            return self.processor.process_game_state(board.group(1), "")[:self.plan_length]
+        return [self.rng.choice(valid_moves) for _ in range(self.plan_length)]
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "malformed": self.malformed, "seconds_delayed": self.seconds_delayed}
+
+llm = MockLLM()
+
+def _prompt_text(messages, system=""):
+    # Both APIs accept either a string or a list of content blocks
+    parts = [system] if isinstance(system, str) else [block.get("text", "") for block in system]
+    for message in messages:
+        content = message.get("content") or ""
+        parts.append(content if isinstance(content, str) else
+                     ' '.join(block.get("text", "") for block in content))
+    return '\n'.join(parts)
+
+def _break_json(text):
+    # Cut the document short, the way a truncated or rambling model answer arrives
+    return text[:max(len(text) // 2, 1)]
+
+def _chunks(text, delay):
+    # Spread the response latency over the stream, so the first chunk arrives early
+    chunks = [text[start:start + STREAM_CHUNK_CHARS] for start in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+    for chunk in chunks:
+        time.sleep(delay / len(chunks))
+        yield chunk
+
+def _sse(events, done_marker=False):
+    # OpenAI ends its streams with a literal [DONE] event
+    def lines():
+        for event, data in events:
+            yield f"{event}data: {json.dumps(data)}\n\n"
+        if done_marker:
+            yield "data: [DONE]\n\n"
+    return Response(lines(), mimetype="text/event-stream")
+
+@app.route('/v1/messages', methods=['POST'])
+def anthropic_messages():
+    data = request.get_json()
+    prompt = _prompt_text(data.get("messages", []), data.get("system", ""))
+    number, plan, malformed, delay = llm.respond(prompt)
+    text = json.dumps({"plan": plan, "thoughts": "Mock plan from the local LLM server."})
+    if malformed:
+        text = _break_json(text)
+    message = {
+        "id": f"msg_mock_{number}",
+        "type": "message",
+        "role": "assistant",
+        "model": data.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)},
+    }
+    if not data.get("stream"):
+        time.sleep(delay)
+        return jsonify(message)
+
+    def events():
+        yield "event: message_start\n", {"type": "message_start", "message": dict(
+            message, content=[], stop_reason=None, usage={"input_tokens": estimate_tokens(prompt), "output_tokens": 0})}
+        yield "event: content_block_start\n", {"type": "content_block_start", "index": 0,
+                                                "content_block": {"type": "text", "text": ""}}
+        for chunk in _chunks(text, delay):
+            yield "event: content_block_delta\n", {"type": "content_block_delta", "index": 0,
+                                                    "delta": {"type": "text_delta", "text": chunk}}
+        yield "event: content_block_stop\n", {"type": "content_block_stop", "index": 0}
+        yield "event: message_delta\n", {"type": "message_delta",
+                                          "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                          "usage": {"output_tokens": estimate_tokens(text)}}
+        yield "event: message_stop\n", {"type": "message_stop"}
+    return _sse(events())
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def openai_chat_completions():
+    data = request.get_json()
+    prompt = _prompt_text(data.get("messages", []))
+    tools = [tool["function"] for tool in data.get("tools", []) if tool.get("type") == "function"]
+    valid_moves = None
+    if tools:
+        moves = tools[0].get("parameters", {}).get("properties", {}).get("moves", {})
+        valid_moves = moves.get("items", {}).get("enum")
+    number, plan, malformed, delay = llm.respond(prompt, valid_moves)
+
+    content = "Mock insights from the local LLM server."
+    arguments = None
+    finish_reason = "stop"
+    if tools:
+        arguments = json.dumps({"moves": plan})
+        if malformed:
+            arguments = _break_json(arguments)
+        finish_reason = "tool_calls"
+    elif malformed:
+        content = _break_json(json.dumps({"plan": plan}))
+    completion_tokens = estimate_tokens(content + (arguments or ""))
+    header = {
+        "id": f"chatcmpl-mock-{number}",
+        "created": int(time.time()),
+        "model": data.get("model", "mock"),
+    }
+    tool_call = {"id": f"call_mock_{number}", "type": "function", "function": {"name": tools[0]["name"]}} if tools else None
+
+    if not data.get("stream"):
+        time.sleep(delay)
+        message = {"role": "assistant", "content": content}
+        if tool_call:
+            message["tool_calls"] = [dict(tool_call, function=dict(tool_call["function"], arguments=arguments))]
+        return jsonify(dict(header, object="chat.completion", choices=[
+            {"index": 0, "message": message, "finish_reason": finish_reason}
+        ], usage={"prompt_tokens": estimate_tokens(prompt), "completion_tokens": completion_tokens,
+                  "total_tokens": estimate_tokens(prompt) + completion_tokens}))
+
+    def chunk(delta, reason=None):
+        return "", dict(header, object="chat.completion.chunk",
+                        choices=[{"index": 0, "delta": delta, "finish_reason": reason}])
+
+    def events():
+        # Content streams first, then the tool call arguments; the latency is spread over both by length
+        total = len(content) + len(arguments or "")
+        yield chunk({"role": "assistant", "content": ""})
+        for piece in _chunks(content, delay * len(content) / total):
+            yield chunk({"content": piece})
+        if tool_call:
+            yield chunk({"tool_calls": [dict(tool_call, index=0, function=dict(tool_call["function"], arguments=""))]})
+            for piece in _chunks(arguments, delay * len(arguments) / total):
+                yield chunk({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]})
+        yield chunk({}, finish_reason)
+
+    return _sse(events(), done_marker=True)
+
+@app.route('/mock/stats', methods=['GET'])
+def mock_stats():
+    return jsonify(llm.stats())
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic and OpenAI APIs")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. fixed:0.5, uniform:0.2,1.5, lognormal:-0.5,0.4")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses with broken JSON")
+    parser.add_argument("--plans", help="JSON file with a list of plans to return in order")
+    parser.add_argument("--plan-source", choices=["random", "processor"], default="random")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    global llm
+    plans = None
+    if args.plans:
+        with open(args.plans) as plans_file:
+            plans = json.load(plans_file)
+    llm = MockLLM(args.latency, args.malformed_rate, plans, args.plan_source, seed=args.seed)
+    app.run(port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    # Point the agents here with ANTHROPIC_BASE_URL=http://localhost:5100,
+    # OPENAI_BASE_URL=http://localhost:5100/v1 and any non-empty API keys
+    main()
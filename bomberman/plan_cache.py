@@ -0,0 +1,106 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class PlanCache:
+    """
+    Cache of LLM plans keyed by a hash of the normalized game state and prompt version.
+
+    Entries live in an in-memory LRU and, when `path` is given, in an SQLite
+    file that survives restarts. Only the board, the score and the last move
+    go into the key, so the same position reached on a different move number
+    or after a reset is a hit. Bump `prompt_version` whenever the prompt
+    changes so old plans are not reused.
+    """
+
+    def __init__(self, prompt_version, max_entries=1024, path=None):
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan TEXT NOT NULL)")
+            self._db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compute_seconds = 0.0  # Time spent computing missed plans
+
+    def key(self, game_state, game_info, last_move):
+        board = '\n'.join(row.rstrip() for row in game_state.strip().split('\n'))
+        score = re.search(r"Score: (-?\d+)", game_info or "")
+        normalized = [self.prompt_version, board, score.group(1) if score else game_info, last_move]
+        return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT plan FROM plans WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, json.loads(row[0]))
+                    return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, plan):
+        with self._lock:
+            self._remember(key, plan)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO plans (key, plan) VALUES (?, ?)", (key, json.dumps(plan)))
+                self._db.commit()
+
+    def discard(self, key):
+        """Forget the plan for `key`, e.g. after it turned out to be unplayable."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                self._db.commit()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached plan for `key`, or call `compute()` and cache its result unless it is None."""
+        plan = self.get(key)
+        if plan is not None:
+            return plan
+        start = time.perf_counter()
+        plan = compute()
+        with self._lock:
+            self.compute_seconds += time.perf_counter() - start
+        if plan is not None:
+            self.put(key, plan)
+        return plan
+
+    def _remember(self, key, plan):
+        self._entries[key] = plan
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            mean_compute = self.compute_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "seconds_saved": self.hits * mean_compute,  # Estimated from the mean miss latency
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,147 @@
+import json
+import queue
+import threading
+import time
+
+import requests
+
+class PlanStreamParser:
+    """
+    Incremental parser for a JSON object holding a list of commands, as an LLM streams it.
+
+    feed() takes the text as it arrives and returns the strings of the `key`
+    array that were completed by it, so each command can be acted on before
+    the rest of the response exists. Text before the first '{' is skipped,
+    other top-level string fields (e.g. "thoughts") are kept for result(),
+    and anything nested deeper is ignored. Raw newlines and control
+    characters inside strings are accepted; a string that still cannot be
+    decoded (e.g. an invalid escape) marks the response as malformed and
+    ends parsing.
+    """
+
+    def __init__(self, key="plan"):
+        self.key = key
+        self.items = []
+        self.values = {}  # Top-level string fields
+        self.complete = False  # The outer object was closed
+        self.malformed = False  # A string could not be decoded
+        self.text = ""
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._chars = []
+        self._field = None
+        self._expect_key = False
+
+    def feed(self, text):
+        self.text += text
+        completed = []
+        for char in text:
+            if self.complete or self.malformed:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    try:
+                        value = json.loads('"' + ''.join(self._chars) + '"', strict=False)
+                    except json.JSONDecodeError:
+                        self.malformed = True
+                        break
+                    completed.extend(self._end_string(value))
+                    continue
+                self._chars.append(char)
+            elif char == '"' and self._stack:
+                self._in_string = True
+                self._chars = []
+            elif char == '{' or (char == '[' and self._stack):
+                self._stack.append(char)
+                self._expect_key = char == '{' and len(self._stack) == 1
+            elif char in '}]' and self._stack:
+                self._stack.pop()
+                self.complete = not self._stack
+            elif char == ',' and self._stack == ['{']:
+                self._expect_key = True
+        return completed
+
+    def _end_string(self, value):
+        if self._stack == ['{']:
+            if self._expect_key:
+                self._field = value
+                self._expect_key = False
+            else:
+                self.values[self._field] = value
+        elif self._stack == ['{', '['] and self._field == self.key:
+            self.items.append(value)
+            return [value]
+        return []
+
+    def result(self):
+        return dict(self.values, **{self.key: list(self.items)})
+
+class StreamingPlanExecutor:
+    """
+    Posts commands to /plan while the rest of the plan is still being generated.
+
+    A background thread sends every command submitted since its last
+    request as one batch, so the first command goes out the moment it is
+    known and later ones share round trips. Once a batch is stopped by a
+    stop condition, later commands are dropped. Commands submitted with an
+    expectation (see PlanValidator.expected) are sent with it as /plan's
+    `expect`, so the server stops at the first step that diverges.
+    """
+
+    def __init__(self, base_url, stop_on=("failed_move",)):
+        self.base_url = base_url
+        self.stop_on = list(stop_on)
+        self.submitted = 0
+        self.started = time.perf_counter()
+        self.first_move_seconds = None  # From construction to the first /plan request
+        self._queue = queue.Queue()
+        self._responses = []
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, command, expected=None):
+        self.submitted += 1
+        self._queue.put((command, expected))
+
+    def finish(self):
+        """Wait for every submitted command and return the merged /plan response data, or None if none ran."""
+        self._queue.put(None)
+        self._thread.join()
+        if not self._responses:
+            return None
+        data = dict(self._responses[-1])
+        data["steps"] = [step for response in self._responses for step in response["steps"]]
+        data["executed"] = len(data["steps"])
+        return data
+
+    def _run(self):
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get())
+            if None in batch:
+                done = True
+                batch = batch[:batch.index(None)]
+            if not batch or self._stopped:
+                continue
+            if self.first_move_seconds is None:
+                self.first_move_seconds = time.perf_counter() - self.started
+            body = {"commands": [command for command, _ in batch], "stop_on": self.stop_on}
+            if all(expected is not None for _, expected in batch):
+                body["expect"] = [expected["position"] + [expected["score"]] for _, expected in batch]
+            response = requests.post(f"{self.base_url}/plan", json=body)
+            if response.status_code != 200:
+                print(f"Error executing plan: {response.status_code}")
+                self._stopped = True
+                continue
+            data = response.json()
+            self._responses.append(data)
+            self._stopped = data["stopped_by"] is not None
@@ -0,0 +1,106 @@
+import numpy as np
+
+from game import STONE
+
+REPAIRS = ['pass', 'up', 'down', 'left', 'right']  # Replacement commands, tried in this order
+
+def _play(game, command):
+    """Play `command` on a fork of `game`; return (fork, success, whether the player was hit)."""
+    sim = game.fork()
+    stones = np.count_nonzero(sim.board.grid == STONE)
+    score = sim.player.score
+    success = sim.apply_command(command)
+    destroyed = stones - np.count_nonzero(sim.board.grid == STONE)
+    return sim, success, sim.player.score < score + 10 * destroyed
+
+def _expectation(game):
+    return {"position": [game.player.x, game.player.y], "score": game.player.score, "game_state": game.get_game_state()}
+
+def can_survive(game):
+    """
+    Return whether some sequence of moves keeps the player clear of every live bomb.
+
+    Where the player walks does not change when or what the bombs hit, so a
+    breadth-first search over positions, one tick at a time until the last
+    bomb has gone off, is enough.
+    """
+    frontier = [game]
+    while len(frontier[0].board.bombs):
+        positions = {}
+        for node in frontier:
+            for command in REPAIRS:
+                sim, success, hit = _play(node, command)
+                if (success or command == 'pass') and not hit:
+                    positions.setdefault((sim.player.x, sim.player.y), sim)
+        if not positions:
+            return False
+        frontier = list(positions.values())
+    return True
+
+class PlanValidator:
+    """
+    Replays a plan command by command on a local copy of the game and stops it at the first bad step.
+
+    A step is bad when the server would reject it (a move off the board or
+    into a wall or stone), which ends a /plan with failed_move, or when it
+    leaves the player unable to dodge the live bombs. The bad step is
+    replaced with the first command from REPAIRS that is neither, and
+    everything after it is dropped so the agent can replan from the real
+    board. If the player is already trapped when validation starts, only
+    illegal steps are cut. Walking onto a bomb and placing a second bomb on
+    the same cell are both legal, as on the server.
+    """
+
+    def __init__(self, game, repair=True):
+        self.game = game.fork()  # Where the accepted commands leave the game
+        self.initial = _expectation(self.game)
+        self.repair = repair
+        self.accepted = []  # Commands to execute, including a repair
+        self.expected = []  # Where each accepted command should leave the game, see _expectation
+        self.checked = 0  # Plan commands passed to check()
+        self.problem = None  # "illegal" or "fatal" once a step was cut
+        self.step = None  # Index of the cut step in the plan
+        self.rejected = None  # Command of the cut step
+        self.repaired = None  # Command that replaced the cut step
+        self._trapped = not can_survive(self.game)
+
+    def check(self, command):
+        """Validate the plan's next command and return the commands to execute in its place."""
+        self.checked += 1
+        if self.problem is not None:
+            return []
+        sim, problem = self._try(command)
+        if problem is None:
+            return self._accept(sim, command)
+        self.problem, self.step, self.rejected = problem, self.checked - 1, command
+        if self.repair:
+            for repair in REPAIRS:
+                if repair != command:
+                    sim, repair_problem = self._try(repair)
+                    if repair_problem is None:
+                        self.repaired = repair
+                        return self._accept(sim, repair)
+        return []
+
+    def _try(self, command):
+        sim, success, hit = _play(self.game, command)
+        if not success:
+            return sim, "illegal"
+        if not self._trapped and (hit or not can_survive(sim)):
+            return sim, "fatal"
+        return sim, None
+
+    def _accept(self, sim, command):
+        self.game = sim
+        self.accepted.append(command)
+        self.expected.append(_expectation(sim))
+        return [command]
+
+def validate_plan(game, plan, repair=True):
+    """Check a whole plan; the returned PlanValidator holds the commands to execute and why it was cut."""
+    validator = PlanValidator(game, repair)
+    for command in plan:
+        validator.check(command)
+        if validator.problem is not None:
+            break
+    return validator
@@ -0,0 +1,106 @@
+import math
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+ENCODINGS = ["ascii", "rle", "coords", "viewport"]
+
+def _rows(game_state):
+    return game_state.strip('\n').split('\n')
+
+def _find(rows, char):
+    return [(x, y) for y, row in enumerate(rows) for x, cell in enumerate(row) if cell == char]
+
+def _format_cells(cells):
+    return ' '.join(f"({x},{y})" for x, y in cells) or "none"
+
+def encode_ascii(game_state):
+    return game_state
+
+def encode_rle(game_state):
+    lines = ["Board rows, run-length encoded: '3.' means three empty cells. "
+             "'.' empty, '#' wall, 'S' stone, 'P' you, 'B' bomb."]
+    for row in _rows(game_state):
+        runs = []
+        run_char, run_length = row[0], 0
+        for cell in row + '\n':
+            if cell == run_char:
+                run_length += 1
+                continue
+            char = '.' if run_char == ' ' else run_char
+            runs.append(f"{run_length}{char}" if run_length > 1 else char)
+            run_char, run_length = cell, 1
+        lines.append(''.join(runs))
+    return '\n'.join(lines)
+
+def encode_coords(game_state):
+    rows = _rows(game_state)
+    height, width = len(rows), len(rows[0])
+
+    # Every board has walls on the border and on cells where both coordinates are even
+    def standard_wall(x, y):
+        return x in (0, width - 1) or y in (0, height - 1) or (x % 2 == 0 and y % 2 == 0)
+    walls = set(_find(rows, '#'))
+    extra_walls = sorted((x, y) for x, y in walls if not standard_wall(x, y))
+    missing_walls = sorted((x, y) for y in range(height) for x in range(width)
+                           if standard_wall(x, y) and (x, y) not in walls)
+
+    lines = [f"Board {width}x{height}, cells as (x,y) with x the column and y the row, both from 0.",
+             "Walls: the outer border and every cell where x and y are both even."]
+    if extra_walls:
+        lines.append(f"Extra walls: {_format_cells(extra_walls)}")
+    if missing_walls:
+        lines.append(f"No wall at: {_format_cells(missing_walls)}")
+    # Grouping stones by row writes each y once
+    stone_rows = [f"y={y}: " + ' '.join(str(x) for x, cell in enumerate(row) if cell == 'S')
+                  for y, row in enumerate(rows) if 'S' in row]
+    lines.append(f"Stones, as x columns per row: {'; '.join(stone_rows) or 'none'}")
+    lines.append(f"Bombs: {_format_cells(_find(rows, 'B'))}")
+    lines.append(f"You: {_format_cells(_find(rows, 'P'))}")
+    lines.append("All other cells are empty.")
+    return '\n'.join(lines)
+
+def encode_viewport(game_state, radius=5):
+    rows = _rows(game_state)
+    height, width = len(rows), len(rows[0])
+    player = _find(rows, 'P')
+    x, y = player[0] if player else (width // 2, height // 2)
+    left, right = max(x - radius, 0), min(x + radius, width - 1)
+    top, bottom = max(y - radius, 0), min(y + radius, height - 1)
+    header = (f"Part of the {width}x{height} board around you: columns x={left}..{right}, rows y={top}..{bottom}. "
+              "'#' wall, 'S' stone, ' ' empty, 'P' you, 'B' bomb.")
+    return '\n'.join([header] + [row[left:right + 1] for row in rows[top:bottom + 1]])
+
+ENCODERS = {
+    "ascii": encode_ascii,
+    "rle": encode_rle,
+    "coords": encode_coords,
+    "viewport": encode_viewport,
+}
+
+def encode_board(game_state, encoding="ascii", **options):
+    """
+    Encode a board string for an LLM prompt.
+
+    :param encoding: One of ENCODINGS
+    :param options: Encoder options, e.g. radius for "viewport"
+    """
+    if encoding not in ENCODERS:
+        raise ValueError(f"Unknown board encoding: {encoding}")
+    return ENCODERS[encoding](game_state, **options)
+
+def estimate_tokens(text):
+    # tiktoken gives exact GPT-4o counts when installed; otherwise about 4 characters per token
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    return math.ceil(len(text) / 4)
+
+def encoding_report(game_state):
+    """Return (encoding, characters, estimated tokens) for every encoding, smallest first."""
+    report = []
+    for encoding in ENCODINGS:
+        text = encode_board(game_state, encoding)
+        report.append((encoding, len(text), estimate_tokens(text)))
+    return sorted(report, key=lambda item: item[2])
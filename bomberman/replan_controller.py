@@ -0,0 +1,79 @@
+from collections import Counter
+
+class ReplanController:
+    """
+    Keeps a validated plan until the game stops matching it.
+
+    Every pending command carries the position, score and board the local
+    simulation expects after it (see PlanValidator.expected). request()
+    sends them to /plan as `expect`, so the server stops at the first step
+    that turns out differently, and update() compares the response with
+    the expectation. A new plan is needed only when the plan has run out or
+    the game diverged: a failed move, a player off course, a score change
+    from a surprise explosion, or a board that no longer matches, e.g.
+    because the stone the plan was heading for is gone. Commands that were
+    never executed, e.g. after an HTTP error, stay pending.
+    """
+
+    def __init__(self, stop_on=("failed_move",)):
+        self.stop_on = list(stop_on)
+        self.pending = []  # (command, expectation) not yet executed
+        self.start = None  # Expectation for the board the pending commands start from
+        self.plans = 0
+        self.divergences = Counter()  # By reason
+        self.last_divergence = None
+
+    def needs_plan(self):
+        return not self.pending
+
+    def adopt(self, validator):
+        """Take over the commands a PlanValidator accepted, with the states it expects after each."""
+        self.pending = list(zip(validator.accepted, validator.expected))
+        self.start = validator.initial
+        self.plans += 1
+        self.last_divergence = None
+
+    def request(self):
+        """Return the /plan request body for the pending commands."""
+        return {
+            "commands": [command for command, _ in self.pending],
+            "stop_on": self.stop_on,
+            "expect": [expected["position"] + [expected["score"]] for _, expected in self.pending],
+        }
+
+    def sync(self, game_state):
+        """Check a freshly fetched board against where the pending commands start; return the divergence, if any."""
+        if self.pending and game_state != self.start["game_state"]:
+            return self._diverge("state")
+        return None
+
+    def update(self, data):
+        """
+        Match a /plan response, which may cover only the first pending commands, against the expectations.
+
+        :return: The divergence reason, or None if the game is still on plan
+        """
+        steps = data["steps"]
+        executed = self.pending[:len(steps)]
+        self.pending = self.pending[len(steps):]
+        if executed:
+            self.start = executed[-1][1]
+        for step, (command, expected) in zip(steps, executed):
+            if not step["success"]:
+                return self._diverge("failed_move")
+            if step["position"] != expected["position"]:
+                return self._diverge("position")
+            if step["score"] != expected["score"]:
+                return self._diverge("score")
+        if executed and data.get("game_state") is not None and data["game_state"] != self.start["game_state"]:
+            return self._diverge("board")
+        return None
+
+    def _diverge(self, reason):
+        self.pending = []
+        self.divergences[reason] += 1
+        self.last_divergence = reason
+        return reason
+
+    def stats(self):
+        return {"plans": self.plans, "divergences": dict(self.divergences)}
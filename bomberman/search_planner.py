@@ -0,0 +1,143 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game import EMPTY, STONE, Game
+from metrics import metrics
+
+COMMANDS = ['up', 'down', 'left', 'right', 'pass', 'bomb']
+# Random rollouts bomb sparingly; uniform bombing mostly measures self-hits
+ROLLOUT_WEIGHTS = [4, 4, 4, 4, 2, 1]
+
+def _state_key(game):
+    bombs = tuple(sorted(game.board.bombs))
+    return game.player.x, game.player.y, bombs, game.board.grid.tobytes()
+
+def _dilate(mask):
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+def stone_distances(grid):
+    """Path distance from every empty cell to the nearest cell next to a stone, -1 where unreachable."""
+    passable = grid == EMPTY
+    reached = passable & _dilate(grid == STONE)
+    dist = np.where(reached, 0, -1)
+    frontier = reached
+    step = 0
+    while frontier.any():
+        step += 1
+        frontier = _dilate(frontier) & passable & ~reached
+        reached |= frontier
+        dist[frontier] = step
+    return dist
+
+def rollout_values(games, rollouts, depth, seed):
+    """
+    Estimate each game's future score gain with random playouts.
+
+    Top-level so it can run in a worker process.
+
+    :return: Mean score change over `rollouts` playouts of `depth` moves, per game
+    """
+    rng = random.Random(seed)
+    values = []
+    for game in games:
+        total = 0
+        for _ in range(rollouts):
+            sim = game.fork()
+            for command in rng.choices(COMMANDS, ROLLOUT_WEIGHTS, k=depth):
+                sim.apply_command(command)
+            total += sim.player.score - game.player.score
+        values.append(total / rollouts)
+    return values
+
+class SearchPlanner:
+    """
+    Beam search over simulated futures of a Game, guided by random rollouts.
+
+    Every level expands each beam entry by every command that succeeds on a
+    fork of the game, merges identical states, and keeps the `beam_width`
+    best by score plus the mean rollout gain, minus `distance_weight` per
+    step still to walk to the nearest stone. Rollouts are spread over a
+    process pool. Once `time_budget` seconds have passed, the remaining
+    levels skip the rollouts and are ranked by score and stone distance
+    only, so a plan is always returned on time.
+    """
+
+    def __init__(self, beam_width=6, rollouts=8, rollout_depth=6, time_budget=1.0, workers=4, plan_length=10,
+                 distance_weight=1.0):
+        self.beam_width = beam_width
+        self.distance_weight = distance_weight
+        self.rollouts = rollouts
+        self.rollout_depth = rollout_depth
+        self.time_budget = time_budget
+        self.workers = workers  # 0 runs rollouts in this process
+        self.plan_length = plan_length
+        self._pool = None
+        self._seed = 0
+
+    def process_game_state(self, game_state, game_info, bombs=None):
+        """Plan from the API's board string and game info; same output as GameStateProcessor."""
+        return self.plan(Game.from_state(game_state, game_info, bombs))
+
+    @metrics.timed("search_plan")
+    def plan(self, game):
+        deadline = time.monotonic() + self.time_budget
+        beam = [(game.player.score, [], game.fork())]
+        distances = {}  # Stone distance fields by grid; most children share their parent's grid
+        for _ in range(self.plan_length):
+            children = {}
+            for _, moves, node in beam:
+                for command in COMMANDS:
+                    child = node.fork()
+                    # A failed move leaves the same state as 'pass' but would be rejected by the server
+                    if not child.apply_command(command) and command != 'pass':
+                        continue
+                    key = _state_key(child)
+                    if key not in children or child.player.score > children[key][1].player.score:
+                        children[key] = (moves + [command], child)
+            candidates = list(children.values())
+            values = [child.player.score - self.distance_weight * self._stone_distance(child, distances)
+                      for _, child in candidates]
+            if time.monotonic() < deadline:
+                gains = self._rollout_values([child for _, child in candidates])
+                values = [value + gain for value, gain in zip(values, gains)]
+            ranked = sorted(zip(values, candidates), key=lambda item: item[0], reverse=True)
+            beam = [(value, moves, child) for value, (moves, child) in ranked[:self.beam_width]]
+        return beam[0][1]
+
+    def _stone_distance(self, game, distances):
+        key = game.board.grid.tobytes()
+        if key not in distances:
+            distances[key] = stone_distances(game.board.grid)
+        # No reachable stone left is as good as standing next to one
+        return max(int(distances[key][game.player.y, game.player.x]), 0)
+
+    def _rollout_values(self, games):
+        self._seed += 1
+        if not self.workers:
+            return rollout_values(games, self.rollouts, self.rollout_depth, self._seed)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        chunk = -(-len(games) // self.workers)
+        futures = [self._pool.submit(rollout_values, games[start:start + chunk], self.rollouts, self.rollout_depth,
+                                     self._seed * self.workers + index)
+                   for index, start in enumerate(range(0, len(games), chunk))]
+        return [value for future in futures for value in future.result()]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,80 @@
+import struct
+
+import numpy as np
+
+from game import BOMB, CELL_CHARS, PLAYER
+
+# Binary state layout (little-endian):
+#   header  magic, version, width, height, bomb_timer, move_counter, score,
+#           player x, player y, bomb count, player count; score and position are player 1's
+#   bombs   bomb count x (x, y, timer) with timer = moves since placement
+#   players player count - 1 x (x, y, score) for players 2..N
+#   grid    width * height cell codes (EMPTY, WALL, STONE), 2 bits each,
+#           four cells per byte, lowest bits first, row-major
+MAGIC = b'BMBR'
+VERSION = 2
+HEADER = struct.Struct('<4sBBBBIiBBHH')
+BOMB_RECORD = struct.Struct('<BBB')
+PLAYER_RECORD = struct.Struct('<BBi')
+CONTENT_TYPE = 'application/x-bomberman-state'
+
+def pack_grid(grid):
+    codes = grid.astype(np.uint8).ravel()
+    codes = np.concatenate([codes, np.zeros(-len(codes) % 4, dtype=np.uint8)])
+    return (codes[0::4] | (codes[1::4] << 2) | (codes[2::4] << 4) | (codes[3::4] << 6)).tobytes()
+
+def unpack_grid(data, width, height):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.stack([(packed >> shift) & 0b11 for shift in (0, 2, 4, 6)], axis=1).ravel()
+    return codes[:width * height].astype(np.int8).reshape(height, width)
+
+def encode_state(game):
+    """Encode the game's board, bombs, players and counters as compact bytes."""
+    board = game.board
+    bombs = list(board.bombs)
+    header = HEADER.pack(MAGIC, VERSION, board.width, board.height, game.bomb_timer,
+                         game.move_counter, game.player.score, game.player.x, game.player.y, len(bombs),
+                         len(game.players))
+    bomb_records = b''.join(BOMB_RECORD.pack(x, y, timer) for x, y, timer in bombs)
+    player_records = b''.join(PLAYER_RECORD.pack(player.x, player.y, player.score) for player in game.players[1:])
+    return header + bomb_records + player_records + pack_grid(board.grid)
+
+def decode_state(data):
+    """
+    Decode bytes produced by encode_state.
+
+    :param data: Binary state as returned by the /state/binary endpoint
+    :return: Dict with the grid as a (height, width) array of cell codes,
+             player 1's position and score, every player as (x, y, score),
+             bombs as (x, y, timer) tuples and counters
+    """
+    magic, version, width, height, bomb_timer, move_counter, score, player_x, player_y, bomb_count, player_count = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported state encoding: {magic!r} v{version}")
+    offset = HEADER.size
+    bombs = [BOMB_RECORD.unpack_from(data, offset + i * BOMB_RECORD.size) for i in range(bomb_count)]
+    offset += bomb_count * BOMB_RECORD.size
+    players = [(player_x, player_y, score)] + [PLAYER_RECORD.unpack_from(data, offset + i * PLAYER_RECORD.size)
+                                               for i in range(player_count - 1)]
+    offset += (player_count - 1) * PLAYER_RECORD.size
+    return {
+        "width": width,
+        "height": height,
+        "bomb_timer": bomb_timer,
+        "move_counter": move_counter,
+        "score": score,
+        "player": (player_x, player_y),
+        "players": players,
+        "bombs": bombs,
+        "grid": unpack_grid(data[offset:], width, height),
+    }
+
+def render_board(state):
+    """Render a decoded state as the same ASCII board that /state returns."""
+    cells = state["grid"].copy()
+    for x, y, _ in state["bombs"]:
+        cells[y, x] = BOMB
+    for player_x, player_y, _ in state["players"]:
+        cells[player_y, player_x] = PLAYER
+    return '\n'.join([''.join(row) for row in CELL_CHARS[cells]])
@@ -0,0 +1,30 @@
+class BoardMirror:
+    """
+    Client-side copy of the server board, kept current with /state deltas.
+
+    Pass `query()` as the params of GET /state and feed every response
+    (including /move and /bomb responses) to `apply()`. Full boards replace
+    the mirror; delta responses patch only the cells that changed.
+    """
+
+    def __init__(self):
+        self.rows = None
+        self.move_counter = None
+        self.bombs = None  # (x, y, timer) of the live bombs, None until a response carried them
+
+    def query(self):
+        return {} if self.move_counter is None else {"since": self.move_counter}
+
+    def apply(self, data):
+        if "game_state" in data:
+            self.rows = [list(row) for row in data["game_state"].split('\n')]
+        else:
+            for x, y, char in data["changes"]:
+                self.rows[y][x] = char
+        self.move_counter = data["move_counter"]
+        self.bombs = data.get("bombs", self.bombs)
+        return self.game_state
+
+    @property
+    def game_state(self):
+        return '\n'.join([''.join(row) for row in self.rows])
@@ -1,13 +1,28 @@
 import requests
 from openai import OpenAI
-import json
+import asyncio
+import os
+import sys
 import numpy as np
-from typing import List, Tuple
-import time
+from typing import Callable, List, Optional, Tuple
+from agent_runtime import AgentRuntime
+from game import Game
+from board_parser import BoardParser
+from plan_cache import PlanCache
+from plan_stream import PlanStreamParser, StreamingPlanExecutor
+from plan_validator import PlanValidator
+from replan_controller import ReplanController
+from prompt_encoding import encode_board
+from state_mirror import BoardMirror
 
 BASE_URL = "http://localhost:5000"
 
 client = OpenAI()
+parser = BoardParser()
+# BOMBERMAN_BOARD_ENCODING picks how the board is written into prompts: ascii, rle, coords or viewport
+BOARD_ENCODING = os.environ.get("BOMBERMAN_BOARD_ENCODING", "ascii")
+# Bump the prompt version whenever the prompts below change
+plan_cache = PlanCache(f"openai-moves-1-{BOARD_ENCODING}", path=os.environ.get("BOMBERMAN_PLAN_CACHE"))
 
 def print_game_state(game_state: str, game_info: str, debug_info: str):
     print("\nCurrent Game State:")
@@ -16,9 +31,12 @@ def print_game_state(game_state: str, game_info: str, debug_info: str):
     print(f"Debug Info: {debug_info}")
 
 def parse_game_state(game_state: str) -> np.ndarray:
-    return np.array([list(row) for row in game_state.strip().split('\n')])
+    return parser.parse(game_state.strip())
 
 def get_player_position(game_state: np.ndarray) -> Tuple[int, int]:
+    # The parser tracks the player as it parses; only rescan for a different array
+    if game_state is parser.array and parser.player_pos is not None:
+        return parser.player_pos
     player_pos = np.where(game_state == 'P')
     return player_pos[0][0], player_pos[1][0]
 
@@ -33,7 +51,8 @@ def get_valid_moves(game_state: np.ndarray, player_pos: Tuple[int, int]) -> List
     valid_moves.extend(['bomb', 'pass'])
     return valid_moves
 
-def get_openai_command(game_state: str, game_info: str, last_move: str, valid_moves: List[str]) -> List[str]:
+def ask_openai(game_state: str, game_info: str, last_move: str, valid_moves: List[str],
+               on_command: Optional[Callable[[str], None]] = None) -> Optional[List[str]]:
     tools = [
         {
             "type": "function",
@@ -91,7 +110,7 @@ Remember to plan ahead for all 10 moves, considering the consequences of your ac
         """},
         {"role": "user", "content": f"""
 Current game state:
-{game_state}
+{encode_board(game_state, BOARD_ENCODING)}
 
 Game info:
 {game_info}
@@ -104,39 +123,69 @@ Provide your next 10 moves using the make_moves function. Be strategic and avoid
         """}
     ]
 
-    response = client.chat.completions.create(
+    stream = client.chat.completions.create(
         model="gpt-4o-mini",
         messages=messages,
         tools=tools,
         tool_choice="auto",
         max_tokens=500,
+        stream=True,
     )
 
-    if response.choices[0].message.tool_calls:
-        tool_call = response.choices[0].message.tool_calls[0]
-        if tool_call.function.name == "make_moves":
-            moves = json.loads(tool_call.function.arguments)["moves"]
-            return moves
-    
+    # Hand over each move as soon as the streamed tool call arguments close its string
+    arguments = PlanStreamParser("moves")
+    function_name = None
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        for tool_call in chunk.choices[0].delta.tool_calls or []:
+            if tool_call.index != 0 or tool_call.function is None:
+                continue
+            function_name = tool_call.function.name or function_name
+            for move in arguments.feed(tool_call.function.arguments or ""):
+                if on_command is not None and function_name == "make_moves":
+                    on_command(move)
+
+    if function_name == "make_moves" and arguments.complete and not arguments.malformed:
+        return arguments.result()["moves"]
+
     print("Error: No valid function call in the response")
-    return ["pass"] * 10
+    return None
+
+def get_openai_command(game_state: str, game_info: str, last_move: str, valid_moves: List[str],
+                       on_command: Optional[Callable[[str], None]] = None) -> List[str]:
+    # Identical board, score and last move reuse the earlier plan instead of calling the model
+    key = plan_cache.key(game_state, game_info, last_move)
+    moves = plan_cache.get_or_compute(key, lambda: ask_openai(game_state, game_info, last_move, valid_moves, on_command))
+    if moves is None:
+        return ["pass"] * 10
+    return list(moves)
 
-def search_next_n_steps(game_state: str, game_info: str, n: int = 10) -> List[str]:
+def search_next_n_steps(game_state: str, game_info: str, n: int = 10,
+                        on_command: Optional[Callable[[str], None]] = None, last_move: str = "None") -> List[str]:
     """
     Search for the next N steps and make commands based on the current game state.
     
     :param game_state: Current game state as a string
     :param game_info: Current game info as a string
     :param n: Number of steps to search ahead (default is 10)
+    :param on_command: Called with each of the first N moves while the model streams them
+    :param last_move: The last command executed, part of the prompt and the plan cache key
     :return: List of commands for the next N steps
     """
-    last_move = "None"
     game_array = parse_game_state(game_state)
     player_pos = get_player_position(game_array)
     valid_moves = get_valid_moves(game_array, player_pos)
     
+    streamed = []
+
+    def take(move):
+        if on_command is not None and len(streamed) < n:
+            streamed.append(move)
+            on_command(move)
+
     # Get the initial plan from OpenAI using function calling
-    plan = get_openai_command(game_state, game_info, last_move, valid_moves)
+    plan = get_openai_command(game_state, game_info, last_move, valid_moves, take)
     
     print(f"Initial plan: {plan}")
     
@@ -148,17 +197,35 @@ def search_next_n_steps(game_state: str, game_info: str, n: int = 10) -> List[st
     
     return plan
 
+def post_plan(body):
+    """Run a /plan request body on the server and return the response data, or None on error."""
+    response = requests.post(f"{BASE_URL}/plan", json=body)
+    if response.status_code != 200:
+        print(f"Error executing plan: {response.status_code}")
+        return None
+    return response.json()
+
+def print_execution(data):
+    for step in data["steps"]:
+        print(f"Executed {step['command']}: {step['success']}")
+    if data["stopped_by"]:
+        print(f"Plan stopped early: {data['stopped_by']}")
+    print(f"Debug Info: {data['debug_info']}")
+
 def main():
     last_move = "None"
     move_counter = 0
-    plan = []
+    plan_key = None  # Cache key of the plan being executed
+    mirror = BoardMirror()
+    # Plans are kept until the game stops matching them
+    controller = ReplanController()
 
     while True:
         # Get the current game state
-        response = requests.get(f"{BASE_URL}/state")
+        response = requests.get(f"{BASE_URL}/state", params=mirror.query())
         if response.status_code == 200:
             data = response.json()
-            game_state = data["game_state"]
+            game_state = mirror.apply(data)
             game_info = data["game_info"]
             debug_info = data["debug_info"]
             print_game_state(game_state, game_info, debug_info)
@@ -166,40 +233,62 @@ def main():
             print(f"Error getting game state: {response.status_code}")
             break
 
-        # Get command from search_next_n_steps if we don't have a plan or have exhausted the current plan
-        if not plan:
-            plan = search_next_n_steps(game_state, game_info)
-            print(f"New plan: {plan}")
-
-        # Execute the next move in the plan
-        command = plan.pop(0)
-        print(f"Executing command: {command}")
+        if controller.sync(game_state):
+            print(f"Game diverged from the plan: {controller.last_divergence}")
 
-        if command in ["up", "down", "left", "right", "pass"]:
-            response = requests.post(f"{BASE_URL}/move", json={"direction": command})
-            last_move = command
-        elif command == "bomb":
-            response = requests.post(f"{BASE_URL}/bomb")
-            last_move = "bomb"
+        if controller.needs_plan():
+            # Get a new plan from search_next_n_steps, executing its moves while the rest streams in.
+            # Each move is first replayed on a local copy of the game and the plan is cut at the first bad one;
+            # the server stops the plan where the game stops matching that replay.
+            validator = PlanValidator(Game.from_state(game_state, game_info, mirror.bombs))
+            executor = StreamingPlanExecutor(BASE_URL)
 
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Move result: {data['success']}")
-            print(f"Debug Info: {data['debug_info']}")
+            def submit(command):
+                for checked in validator.check(command):
+                    executor.submit(checked, validator.expected[-1])
+            plan_key = plan_cache.key(game_state, game_info, last_move)
+            plan = search_next_n_steps(game_state, game_info, on_command=submit, last_move=last_move)
+            print(f"New plan: {plan}")
+            print(f"Plan cache: {plan_cache.stats()}")
+            # Cached plans, fallback plans and padding were not streamed
+            for command in plan[validator.checked:]:
+                submit(command)
+            if validator.problem is not None:
+                print(f"Plan cut at step {validator.step} ({validator.problem} {validator.rejected}), "
+                      f"replaced with {validator.repaired}. Replanning early.")
+                plan_cache.discard(plan_key)
+            controller.adopt(validator)
+            data = executor.finish()
+            if data is not None:
+                print(f"First move after {executor.first_move_seconds:.2f}s")
         else:
-            print(f"Error: {response.status_code}")
-            # Clear the plan if there's an error
-            plan = []
+            # Moves an interrupted request left over; the plan is still valid, so no new one is needed
+            data = post_plan(controller.request())
+
+        if data is not None:
+            print_execution(data)
+            game_state = mirror.apply(data)
+            if controller.update(data):
+                print(f"Game diverged from the plan: {controller.last_divergence}")
+            last_move = data["steps"][-1]["command"]
+            # A plan that led back to where it was asked for would be served again forever
+            if plan_cache.key(game_state, data["game_info"], last_move) == plan_key:
+                plan_cache.discard(plan_key)
+            move_counter += data["executed"]
+            print(f"Completed {move_counter} moves. Replanning: {controller.stats()}")
 
-        move_counter += 1
-        if move_counter % 10 == 0:
-            print(f"Completed 10 moves.")
-            # Clear the plan to get a new one every 10 moves
-            plan = []
+def async_main():
+    def plan(game_state, game_info, last_move):
+        return search_next_n_steps(game_state, game_info, last_move=last_move)
 
-        time.sleep(0.1)  # Add a small delay to prevent overwhelming the server
+    stats = asyncio.run(AgentRuntime(plan, BASE_URL, plan_cache=plan_cache).run())
+    print(f"Runtime stats: {stats}")
+    print(f"Plan cache: {plan_cache.stats()}")
 
 if __name__ == "__main__":
     print("Bomberman API Test with OpenAI")
     print("-------------------------------")
-    main()
\ No newline at end of file
+    if "--async" in sys.argv:
+        async_main()
+    else:
+        main()
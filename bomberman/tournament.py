@@ -0,0 +1,169 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game import STONE, Game
+from game_state_processor import GameStateProcessor
+from search_planner import SearchPlanner
+
+COMMANDS = ['up', 'down', 'left', 'right', 'pass', 'bomb']
+MAX_MOVES = 200
+
+# Policy factories run inside the worker processes, so each match gets a fresh planner.
+# A factory returns a planner taking (game_state, game_info, last_move) and returning commands,
+# the same interface AgentRuntime uses. The LLM agents are imported lazily because importing
+# them creates API clients; point them at mock_llm_server.py to play offline.
+
+def processor_policy():
+    processor = GameStateProcessor()
+    return lambda game_state, game_info, last_move: processor.process_game_state(game_state, game_info)
+
+def search_policy():
+    # The tournament already spreads matches over processes
+    planner = SearchPlanner(workers=0)
+    return lambda game_state, game_info, last_move: planner.process_game_state(game_state, game_info)
+
+def random_policy():
+    rng = random.Random(0)
+    return lambda game_state, game_info, last_move: rng.choices(COMMANDS, k=10)
+
+def claude_policy():
+    import claude_api
+    thoughts = ["No previous thoughts."]
+
+    def plan(game_state, game_info, last_move):
+        command_data = claude_api.get_claude_command(game_state, game_info, last_move, thoughts[0])
+        thoughts[0] = command_data.get("thoughts", thoughts[0])
+        return command_data["plan"]
+    return plan
+
+def gpt_policy():
+    import json
+    import gptapi
+
+    def plan(game_state, game_info, last_move):
+        _, function_call = gptapi.openai_command(game_state, game_info, last_move)
+        return json.loads(function_call["arguments"])["moves"]
+    return plan
+
+def openai_moves_policy():
+    import test_api
+
+    def plan(game_state, game_info, last_move):
+        return test_api.search_next_n_steps(game_state, game_info, last_move=last_move)
+    return plan
+
+POLICIES = {
+    "processor": processor_policy,
+    "search": search_policy,
+    "random": random_policy,
+    "claude": claude_policy,
+    "gpt": gpt_policy,
+    "openai-moves": openai_moves_policy,
+}
+
+def play_match(name, policy, seed, width=15, height=15, max_moves=MAX_MOVES):
+    """
+    Play one policy on its own seeded game, in the calling process.
+
+    :param policy: Zero-argument factory returning a planner; must be a top-level function
+                   so it can be sent to a worker process
+    :return: Dict with the final score, stones destroyed, hits taken, moves, plans and CPU seconds
+    """
+    start = time.process_time()
+    planner = policy()
+    game = Game(width, height, seed=seed)
+    stones_before = np.count_nonzero(game.board.grid == STONE)
+    hits = 0
+    plans = 0
+    last_move = "None"
+    # The agents print every plan and response
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.move_counter < max_moves:
+            plan = [command for command in planner(game.get_game_state(), game.get_game_info(), last_move)
+                    if command in COMMANDS] or ["pass"]
+            plans += 1
+            for command in plan[:max_moves - game.move_counter]:
+                score = game.player.score
+                stones = np.count_nonzero(game.board.grid == STONE)
+                game.apply_command(command)
+                # Each destroyed stone adds 10 and each hit takes 50
+                destroyed = stones - np.count_nonzero(game.board.grid == STONE)
+                hits += (10 * destroyed - (game.player.score - score)) // 50
+                last_move = command
+    return {
+        "policy": name,
+        "seed": seed,
+        "score": game.player.score,
+        "stones": int(stones_before - np.count_nonzero(game.board.grid == STONE)),
+        "hits": int(hits),
+        "moves": game.move_counter,
+        "plans": plans,
+        "seconds": time.process_time() - start,
+    }
+
+def run_tournament(policies, seeds, width=15, height=15, max_moves=MAX_MOVES, workers=None):
+    """
+    Play every policy on every seeded board concurrently.
+
+    :param policies: Dict of name -> policy factory, see play_match
+    :param workers: Worker processes, None for one per CPU
+    :return: (match results in submission order, wall seconds for the whole tournament)
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_match, name, policy, seed, width, height, max_moves)
+                   for name, policy in policies.items() for seed in seeds]
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+def summarize(results):
+    """Aggregate match results per policy, best mean score first."""
+    by_policy = {}
+    for result in results:
+        by_policy.setdefault(result["policy"], []).append(result)
+    rows = []
+    for name, matches in by_policy.items():
+        rows.append({
+            "policy": name,
+            "matches": len(matches),
+            "mean_score": np.mean([match["score"] for match in matches]),
+            "min_score": min(match["score"] for match in matches),
+            "max_score": max(match["score"] for match in matches),
+            "stones": sum(match["stones"] for match in matches),
+            "hits": sum(match["hits"] for match in matches),
+            "moves": sum(match["moves"] for match in matches),
+            "plans": sum(match["plans"] for match in matches),
+            "seconds": sum(match["seconds"] for match in matches),
+        })
+    return sorted(rows, key=lambda row: row["mean_score"], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play policies against each other on seeded boards")
+    parser.add_argument("policies", nargs="*", default=["processor", "search", "random"],
+                        help=f"Any of {', '.join(POLICIES)}")
+    parser.add_argument("--seeds", type=int, default=8, help="Number of seeded boards, seeds 0..N-1")
+    parser.add_argument("--moves", type=int, default=MAX_MOVES)
+    parser.add_argument("--size", type=int, default=15, help="Board width and height")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    policies = {name: POLICIES[name] for name in args.policies}
+    results, wall_seconds = run_tournament(policies, range(args.seeds), args.size, args.size, args.moves, args.workers)
+    print(f"{'policy':>12}  {'matches':>7}  {'mean':>7}  {'min':>5}  {'max':>5}  {'stones':>6}  {'hits':>4}  "
+          f"{'moves':>6}  {'plans':>5}  {'cpu s':>7}")
+    for row in summarize(results):
+        print(f"{row['policy']:>12}  {row['matches']:>7}  {row['mean_score']:>7.1f}  {row['min_score']:>5}  "
+              f"{row['max_score']:>5}  {row['stones']:>6}  {row['hits']:>4}  {row['moves']:>6}  {row['plans']:>5}  "
+              f"{row['seconds']:>7.2f}")
+    print(f"Wall time: {wall_seconds:.2f}s for {len(results)} matches")
+
+if __name__ == "__main__":
+    print("Bomberman tournament")
+    print("--------------------")
+    main()
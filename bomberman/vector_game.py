@@ -0,0 +1,135 @@
+import numpy as np
+
+from game import BOMB, EMPTY, PLAYER, STONE, WALL, blast_rays, clear_corners, wall_grid
+
+# Action indices accepted by VectorGame.step
+ACTIONS = ['up', 'down', 'left', 'right', 'pass', 'bomb']
+BOMB_ACTION = ACTIONS.index('bomb')
+ACTION_DELTAS = np.array([(0, -1), (0, 1), (-1, 0), (1, 0), (0, 0), (0, 0)])
+
+class VectorGame:
+    """
+    Headless engine that advances N independent Bomberman games in lockstep.
+
+    Follows the rules of game.Game: every action costs one move and ticks the
+    bombs, bombs go off `bomb_timer` moves after the one they were placed on,
+    and each blast ray travels `blast_range` cells, stopping at walls and at
+    the first stone it destroys. Stones are worth 10 points and every ray that
+    crosses the player costs 50.
+
+    Since a game places at most one bomb per move and every fuse is the same
+    length, live bombs are kept in a ring of `bomb_timer + 1` slots per game,
+    and exactly one slot per game is due on each step.
+
+    Games that finish (no stones left or `max_moves` reached) are reset
+    automatically; the observation returned for them is the fresh board.
+    """
+
+    def __init__(self, num_games, width=15, height=15, max_moves=200, seed=None):
+        self.num_games = num_games
+        self.width = min(max(width, 15), 31)
+        self.height = min(max(height, 15), 31)
+        self.max_moves = max_moves
+        self.bomb_timer = 3
+        self.blast_range = 2
+        self.rng = np.random.default_rng(seed)
+
+        n, fuse = num_games, self.bomb_timer + 1
+        self.grid = np.empty((n, self.height, self.width), dtype=np.int8)
+        self.player_x = np.empty(n, dtype=np.int64)
+        self.player_y = np.empty(n, dtype=np.int64)
+        self.score = np.empty(n, dtype=np.int64)
+        self.move_counter = np.empty(n, dtype=np.int64)
+        self.bomb_x = np.zeros((n, fuse), dtype=np.int64)
+        self.bomb_y = np.zeros((n, fuse), dtype=np.int64)
+        self.bomb_live = np.zeros((n, fuse), dtype=bool)
+        self.tick = 0
+        self.reset()
+
+    def _create_grids(self, count):
+        grid = wall_grid(self.height, self.width, count)
+        stones = (grid == EMPTY) & (self.rng.random(grid.shape) < 0.3)
+        grid[stones] = STONE
+        clear_corners(grid)
+        return grid
+
+    def reset(self, mask=None):
+        """Start new games for every game selected by the boolean `mask` (all by default)."""
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        count = int(mask.sum())
+        if count:
+            self.grid[mask] = self._create_grids(count)
+            self.player_x[mask] = 1
+            self.player_y[mask] = 1
+            self.score[mask] = 0
+            self.move_counter[mask] = 0
+            self.bomb_live[mask] = False
+        return self.observe()
+
+    def observe(self):
+        """Return the boards as an (N, height, width) array of cell codes with bombs and players overlaid."""
+        obs = self.grid.copy()
+        games, slots = np.nonzero(self.bomb_live)
+        obs[games, self.bomb_y[games, slots], self.bomb_x[games, slots]] = BOMB
+        obs[np.arange(self.num_games), self.player_y, self.player_x] = PLAYER
+        return obs
+
+    def step(self, actions):
+        """
+        Apply one action per game.
+
+        :param actions: Integer array of shape (N,) indexing ACTIONS
+        :return: (observations, rewards, dones)
+        """
+        actions = np.asarray(actions)
+        games = np.arange(self.num_games)
+        fuse = self.bomb_timer + 1
+        old_score = self.score.copy()
+
+        # Moves only succeed onto empty cells
+        new_x = self.player_x + ACTION_DELTAS[actions, 0]
+        new_y = self.player_y + ACTION_DELTAS[actions, 1]
+        in_bounds = (new_x >= 0) & (new_x < self.width) & (new_y >= 0) & (new_y < self.height)
+        target = np.full(self.num_games, WALL, dtype=self.grid.dtype)
+        target[in_bounds] = self.grid[games[in_bounds], new_y[in_bounds], new_x[in_bounds]]
+        moved = target == EMPTY
+        self.player_x = np.where(moved, new_x, self.player_x)
+        self.player_y = np.where(moved, new_y, self.player_y)
+
+        # The slot freed by last step's explosions takes this step's bombs
+        slot = self.tick % fuse
+        placing = actions == BOMB_ACTION
+        self.bomb_x[placing, slot] = self.player_x[placing]
+        self.bomb_y[placing, slot] = self.player_y[placing]
+        self.bomb_live[placing, slot] = True
+
+        self.move_counter += 1
+        self.tick += 1
+        self._explode(self.tick % fuse)
+
+        rewards = (self.score - old_score).astype(np.float32)
+        dones = (self.move_counter >= self.max_moves) | ~(self.grid == STONE).any(axis=(1, 2))
+        self.reset(dones)
+        return self.observe(), rewards, dones
+
+    def _explode(self, slot):
+        games = np.nonzero(self.bomb_live[:, slot])[0]
+        if len(games) == 0:
+            return
+        self.bomb_live[games, slot] = False
+        xs = self.bomb_x[games, slot]
+        ys = self.bomb_y[games, slot]
+
+        ray_x, ray_y, cells, reached = blast_rays(self.grid, xs, ys, self.blast_range, games)
+        ray_game = np.broadcast_to(games.reshape(-1, 1, 1), ray_x.shape)
+
+        # One bomb per game per step, so no stone is hit twice
+        stones = reached & (cells == STONE)
+        self.grid[ray_game[stones], ray_y[stones], ray_x[stones]] = EMPTY
+        self.score[games] += 10 * stones.sum(axis=(1, 2))
+
+        hits = (reached & (cells == EMPTY)
+                & (ray_x == self.player_x[games].reshape(-1, 1, 1))
+                & (ray_y == self.player_y[games].reshape(-1, 1, 1)))
+        self.score[games] -= 50 * hits.sum(axis=(1, 2))
@@ -1,11 +1,22 @@
-from flask import Flask, render_template, jsonify
-from game import Board, Player
+from flask import Flask, Response, render_template, request, stream_with_context
+from game import Game
+from frame_broadcaster import FrameBroadcaster
 
 app = Flask(__name__)
 
 # Initialize the game
-board = Board(32, 32)  # Default size, can be changed later
-players = []
+game = Game(31, 31, num_players=4)  # Default size, can be changed later
+board = game.board
+players = game.players  # Moves go through game.move_player / game.step so the occupancy index stays in sync
+
+def render_state():
+    return {
+        'board': str(board),
+        'players': [{'id': p.id, 'x': p.x, 'y': p.y} for p in players]
+    }
+
+# Anything that changes the board or players must call broadcaster.publish()
+broadcaster = FrameBroadcaster(render_state)
 
 @app.route('/')
 def index():
@@ -13,11 +24,13 @@ def index():
 
 @app.route('/game_state')
 def game_state():
-    state = {
-        'board': str(board),
-        'players': [{'id': p.id, 'x': p.x, 'y': p.y} for p in players]
-    }
-    return jsonify(state)
+    return Response(broadcaster.frame, mimetype='application/json')
+
+@app.route('/game_state/stream')
+def game_state_stream():
+    last_version = request.headers.get('Last-Event-ID', 0, type=int)
+    return Response(stream_with_context(broadcaster.stream(last_version)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)